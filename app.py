@@ -1,9 +1,17 @@
-import pandas as pd
 import streamlit as st
-import plotly.express as px
 from datetime import datetime
 import plotly.graph_objects as go
 
+from claims.charts import claims_over_time_line, line_of_business_bar, status_bar, status_pie, trend_monthly
+from claims.figures import cached_figure
+from claims.filters import FilterState
+from claims.metrics import filtered_metrics, metric_card
+from claims.profiling import rerun_profile
+from claims.timeseries import DEFAULT_MAX_POINTS, MODES
+from claims.ui import (
+    claims_table_section, export_section, fetch_claims_data, performance_panel, searchable_multiselect,
+)
+
 st.set_page_config(
     page_title="Claim Leakage Dashboard Testing",
     page_icon="🏂",
@@ -130,25 +138,19 @@ st.markdown("""
 
 
 
-# Function to fetch data from the claims table
-def fetch_claims_data():
-    try:
-        # Load data from CSV for now
-        df = pd.read_csv('Claims.csv')
-        
-        # Ensure date columns are in the correct format
-        date_columns = [
-            'claim_received_date', 'claim_loss_date', 'claim_finalised_date',
-            'original_verified_date_of_loss_time', 'last_verified_date_of_loss_time',
-            'catastrophe_valid_from_date_time', 'catastrophe_valid_to_date_time', 'update_date'
-        ]
-        for col in date_columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce').dt.date
-        
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        df = pd.DataFrame()  # Return empty DataFrame on failure
-    return df
+# Sections below are fragments: their own widgets rerun only the section,
+# with the source and filters of the last full run as inputs. Changing a
+# filter reruns the whole page.
+
+# Claims Over Time chart with its resolution and point budget options
+@st.fragment
+def claims_over_time_section(source, filters):
+    option_col1, option_col2 = st.columns(2)
+    time_mode = option_col1.selectbox("Resolution", options=MODES)
+    max_points = option_col2.number_input(
+        "Point budget (LTTB)", min_value=10, max_value=5000, value=DEFAULT_MAX_POINTS, step=50
+    )
+    st.plotly_chart(cached_figure(source, 'app.time', filters, claims_over_time_line, (time_mode, max_points)))
 
 # Streamlit app for the report with independent filters and charts
 def main():
@@ -156,14 +158,20 @@ def main():
     st.image("exl.png", width=150)  # Replace 'logo.png' with the path to your logo image file
     st.title("Claim Report Dashboard Testing")
 
+    # Stage timings, on with CLAIMS_PROFILE or ?profile=1 in the URL
+    profile = rerun_profile('app', st.query_params.get('profile'))
+
     # Fetch data from the database
-    data = fetch_claims_data()
+    profile.stage('load')
+    source = fetch_claims_data()
 
-    if not data.empty:
+    if not source.empty:
         # Sidebar for filters
+        profile.stage('filters')
         st.sidebar.header("Filter Options")
 
-        filtered_data = data.copy()  # Start with a copy for independent filtering
+        # Filters are collected first and resolved by the source in one pass
+        filters = FilterState()
 #         st.markdown("""
 #             <style>
 #                 /* Style the input field in the sidebar */
@@ -176,10 +184,12 @@ def main():
 #             </style>
 #         """, unsafe_allow_html=True)
         # Claim number filter (text input)
-        claim_numbers = st.sidebar.text_input("Filter by Claim Number (comma-separated)")
+        claim_numbers = st.sidebar.text_input(
+            "Filter by Claim Number (comma-separated)",
+            help="Claim numbers separated by commas; ABC* matches a prefix and 1000..2000 a numeric range",
+        )
         if claim_numbers:
-            claim_numbers = [num.strip() for num in claim_numbers.split(",") if num.strip()]
-            filtered_data = filtered_data[filtered_data['claim_number'].astype(str).isin(claim_numbers)]
+            filters.parse_claim_query(claim_numbers)
 
         # Text-based filters with an "All" option for each relevant column
         text_columns = [
@@ -187,13 +197,20 @@ def main():
             'fault_rating', 'fault_categorisation'
         ]
         for col in text_columns:
-            unique_values = data[col].dropna().unique().tolist()
+            # Columns with very many values are searched rather than listed;
+            # nothing selected means no filter
+            if source.catalog[col].searchable:
+                selected_values = searchable_multiselect(st.sidebar, source.catalog[col], f"Filter by {col}")
+                if selected_values:
+                    filters.text[col] = selected_values
+                continue
+            unique_values = source.options(col)
             unique_values.insert(0, "All")  # Add "All" option
             selected_values = st.sidebar.multiselect(f"Filter by {col}", options=unique_values, default="All")
             
             # Apply filter only if "All" is not selected
             if "All" not in selected_values:
-                filtered_data = filtered_data[filtered_data[col].isin(selected_values)]
+                filters.text[col] = selected_values
 
         # Independent Date range filters
         date_columns = [
@@ -202,11 +219,11 @@ def main():
             'catastrophe_valid_from_date_time', 'catastrophe_valid_to_date_time'
         ]
         for col in date_columns:
-            min_date, max_date = data[col].min(), data[col].max()
-            if pd.notnull(min_date) and pd.notnull(max_date):
-                date_range = st.sidebar.date_input(f"{col} Range", value=(min_date, max_date))
-                if date_range:
-                    filtered_data = filtered_data[filtered_data[col].between(date_range[0], date_range[1])]
+            bounds = source.date_bounds(col)
+            if bounds is not None:
+                date_range = st.sidebar.date_input(f"{col} Range", value=bounds)
+                if len(date_range) == 2:
+                    filters.dates[col] = (date_range[0], date_range[1])
 
         # Display filtered statistics
         st.markdown("""
@@ -216,8 +233,9 @@ def main():
                 }
             </style>
         """, unsafe_allow_html=True)
+        profile.stage('statistics')
         st.subheader("Filtered Claims Statistics")
-        st.write("Total Claims:", filtered_data["claim_number"].nunique())
+        st.write("Total Claims:", source.count_claims(filters))
         def display_custom_metric(title, value, background_color="#f0f0f0"):
             card_style = f"""
             <style>
@@ -256,14 +274,16 @@ def main():
             # Render the card with custom styling
             st.markdown(card_style + card_html, unsafe_allow_html=True)
         
+        profile.stage('metrics')
         st.subheader("Metrics Overview")
+        metrics = filtered_metrics(source, filters)
         col1, col2, col3, col4, col5, col6 = st.columns(6)
         
         with col1:
-            display_custom_metric("Claims Monitored", "3,071")
+            display_custom_metric(*metric_card(metrics, 'claims_monitored'))
 #             st.metric("**Claims Monitored**", "3,071")
         with col2:
-            display_custom_metric("Claims with Leakage Opportunity", "1,854")
+            display_custom_metric(*metric_card(metrics, 'leakage_claims'))
 
         with col3:
             # Function to display a styled card with a gauge chart inside
@@ -314,10 +334,10 @@ def main():
                     st.markdown(f"<div class='gauge-card'><h3>{title}</h3></div>", unsafe_allow_html=True)
                     st.plotly_chart(fig, use_container_width=True)
 
-            display_custom_metric("Leakage Opportunity %", 60)
+            display_custom_metric(*metric_card(metrics, 'opportunity_pct'))
 
         with col4:
-            display_custom_metric("Potential Leakage $", "$51.2M")
+            display_custom_metric(*metric_card(metrics, 'potential_leakage'))
             
             
 
@@ -327,7 +347,7 @@ def main():
 #         col5, col6 = st.columns(2)
 
         with col5:
-            display_custom_metric("Leakage Rate %", 100)
+            display_custom_metric(*metric_card(metrics, 'leakage_rate_pct'))
 #             def gauge_chart(value, title):
 #                 fig = go.Figure(go.Indicator(
 #                     mode="gauge+number",
@@ -342,7 +362,7 @@ def main():
 #             gauge_chart(60, "Leakage Opportunity %")
 
         with col6:
-            display_custom_metric("Opportunities Not Actioned", "3,063")
+            display_custom_metric(*metric_card(metrics, 'not_actioned'))
             
         
         st.markdown("<br><br>", unsafe_allow_html=True)
@@ -373,20 +393,13 @@ def main():
         col1, col2 = st.columns(2, gap="small")
 
         # Claims by Status chart with customized colors
+        # Figures are cached per dataset version, filters and chart options
+        # (claims.figures), so a repeated state reuses the built chart
         with col1:
+            profile.stage('chart.status')
             st.subheader("Claims by Status")
-            status_counts = filtered_data['claim_status'].value_counts().reset_index()
-            status_counts.columns = ['claim_status', 'count']
-            fig_status = px.bar(
-                status_counts, x='claim_status', y='count', title="Claims by Status", 
-                color='claim_status', color_discrete_sequence=px.colors.sequential.Plasma
-            )
-            fig_status.update_layout(
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#f0f2f6",
-            )
 #             st.markdown('<div class="graph-container">', unsafe_allow_html=True)
-            st.plotly_chart(fig_status)
+            st.plotly_chart(cached_figure(source, 'app.status', filters, status_bar))
 
 #         # Divider between charts
 #         with col2:
@@ -394,30 +407,18 @@ def main():
 
         # Claims Over Time chart
         with col2:
+            profile.stage('chart.time')
             st.subheader("Claims Over Time")
-            claims_over_time = filtered_data.groupby('claim_received_date').size().reset_index(name='claim_count')
-            fig_time = px.line(
-                claims_over_time, x='claim_received_date', y='claim_count', 
-                title="Claims Over Time", color_discrete_sequence=px.colors.sequential.Viridis
-            )
-            fig_time.update_layout(
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#f0f2f6",
-            )
-            st.plotly_chart(fig_time)
+            claims_over_time_section(source, filters)
 
 #         # New side-by-side charts for Claim Status (Pie) and Line of Business (Horizontal Bar)
         col3, col4 = st.columns(2, gap="small")
 
         # Pie chart for Claim Status
         with col3:
+            profile.stage('chart.status_pie')
             st.subheader("Claim Status Distribution")
-            fig_pie = px.pie(filtered_data, names='claim_status', title="Claim Status Distribution", hole=0.3)
-            fig_pie.update_layout(
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#f0f2f6",
-            )
-            st.plotly_chart(fig_pie)
+            st.plotly_chart(cached_figure(source, 'app.status_pie', filters, status_pie))
 
 #         # Divider line
 #         with col4:
@@ -425,69 +426,17 @@ def main():
 
         # Horizontal bar chart for Line of Business
         with col4:
+            profile.stage('chart.line_of_business')
             st.subheader("Claims by Line of Business")
-            line_of_business_counts = filtered_data['line_of_business'].value_counts().reset_index()
-            line_of_business_counts.columns = ['line_of_business', 'count']
-            fig_line_of_business = px.bar(
-                line_of_business_counts, 
-                y='line_of_business', 
-                x='count', 
-                orientation='h', 
-                title="Claims by Line of Business", 
-                color='line_of_business'
-            )
-            fig_line_of_business.update_layout(
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#f0f2f6",
-                showlegend=False,
-            )
-            fig_line_of_business.update_xaxes(title="Count")
-            fig_line_of_business.update_yaxes(title="Line of Business")
-            st.plotly_chart(fig_line_of_business)
+            st.plotly_chart(cached_figure(source, 'app.line_of_business', filters, line_of_business_bar))
             
          
         # Trend graph for Claim Status (Open and Closed) by Year
         # Trend graph for Claim Status (Open and Closed) by Month
+        profile.stage('chart.trend_monthly')
         st.subheader("Claim Status Trend Over Months")
 
-        # Extract month and year from claim_received_date
-        filtered_data['claim_received_date'] = pd.to_datetime(filtered_data['claim_received_date'], errors='coerce')
-        filtered_data['month_year'] = filtered_data['claim_received_date'].dt.to_period('M').astype(str)
-        monthly_status_counts = (
-            filtered_data.groupby(['month_year', 'claim_status'])
-            .size()
-            .reset_index(name='count')
-        )
-
-        # Create bar chart with a line trend for total claims per month
-        fig_trend_monthly = px.bar(
-            monthly_status_counts, 
-            x='month_year', 
-            y='count', 
-            color='claim_status', 
-            title="Monthly Claim Status Trend (Open vs Closed)",
-            barmode='group'
-        )
-
-        # Add a line to show the overall trend of claims per month
-        monthly_totals = monthly_status_counts.groupby('month_year')['count'].sum().reset_index()
-        fig_trend_monthly.add_scatter(
-            x=monthly_totals['month_year'], 
-            y=monthly_totals['count'], 
-            mode='lines+markers', 
-            name='Total Claims Trend',
-            line=dict(color='blue', width=2)
-        )
-
-        # Update layout and background
-        fig_trend_monthly.update_layout(
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#f0f2f6",
-            xaxis_title="Month-Year",
-            yaxis_title="Number of Claims",
-            xaxis_tickangle=-45
-        )
-        st.plotly_chart(fig_trend_monthly)
+        st.plotly_chart(cached_figure(source, 'app.trend_monthly', filters, trend_monthly))
         
 #         # Dropdowns for selecting column and chart type
 #         st.sidebar.header("Custom Graph Options")
@@ -542,31 +491,19 @@ def main():
 #         ])
 
 #         # Display the styled dataframe with a subheader
+        profile.stage('table')
         st.subheader("Filtered Claims Data")
-        filtered_data = filtered_data.head(20)
-#         st.dataframe(styled_data)
-        def style_alternate_rows(x):
-            # Create an empty style object
-            style = pd.DataFrame('', index=x.index, columns=x.columns)
-#             style = style.applymap(lambda v: 'border: 2px solid #5d3a9b')
-            # Apply background color for even rows
-            style.iloc[::2] = 'background-color: #f9f9f9'  # Light gray for even rows
-            style.iloc[1::2] = 'background-color: #e6e6e6'  # Slightly darker gray for odd rows
-            
-            
-            return style
-
-        # Apply the styling to the dataframe
-        styled_df = filtered_data.style.apply(style_alternate_rows, axis=None)
-#         filtered_data = filtered_data.head(20)
-        st.dataframe(styled_df)
+        claims_table_section(source, filters, styled=True)
 
         # Option to download the filtered data
-        csv = filtered_data.to_csv(index=False)
-        st.download_button("Download as CSV", csv, "filtered_claims.csv", "text/csv")
+        profile.stage('export')
+        export_section(source, filters)
         
     else:
         st.warning("No data available.")
 
+    profile.finish()
+    performance_panel(profile)
+
 if __name__ == "__main__":
     main()
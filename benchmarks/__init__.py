@@ -0,0 +1 @@
+# Benchmark harness for the claims data layer; see benchmarks/run.py.
@@ -0,0 +1,332 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_claims_csv
+from claims.categories import CATEGORY_COLUMNS
+from claims.cube import CubeBuilder
+from claims.data import (
+    DASHBOARD_COLUMNS, DATE_COLUMNS, DATE_FILTER_COLUMNS, TEXT_FILTER_COLUMNS, ClaimsDataset,
+    load_frame, read_claims_csv, snapshot_path, source_signature, store_path, write_snapshot,
+)
+from claims.dates import date_bounds, parse_dates
+from claims.export import EXPORT_FORMATS, export_rows
+from claims.filters import FilterState
+from claims.index import FilterIndex
+from claims.ingest import peak_rss, stream_csv
+from claims.metrics import FINANCIAL_COLUMNS
+from claims.timeseries import reduce_time_series
+
+try:
+    import plotly.express as px
+    import plotly.io
+    import plotly.tools
+
+    from claims.charts import city_bar, owner_bar
+except ImportError:  # figure stages are skipped without plotly
+    px = None
+
+# Named dataset sizes; every size is generated once with the same seed
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+# A stage is reported as a regression when it is this much slower than the baseline
+REGRESSION_RATIO = 1.25
+# Stages faster than this are too noisy to compare
+MIN_COMPARE_SECONDS = 0.005
+
+
+# Run fn repeat times and record the best and median wall time under name
+def timed(results, name, fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    results.append({
+        'stage': name,
+        'seconds': min(times),
+        'median_seconds': statistics.median(times),
+        'repeat': repeat,
+    })
+    print(f"  {name:<52} {min(times) * 1000:>10.1f} ms", flush=True)
+    return value
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# The filters a user typically applies one at a time: the most common value
+# of each text column, the middle half of each date and financial range and
+# a batch of claim numbers
+def single_filters(dataset, rng):
+    frame = dataset.frame
+    filters = {}
+    for col in TEXT_FILTER_COLUMNS:
+        filters[f"filter.text.{col}"] = FilterState(text={col: [frame[col].value_counts().index[0]]})
+    for col in DATE_FILTER_COLUMNS:
+        bounds = dataset.date_bounds(col)
+        if bounds is None:
+            continue
+        span = bounds[1] - bounds[0]
+        filters[f"filter.date.{col}"] = FilterState(dates={col: (bounds[0] + span / 4, bounds[1] - span / 4)})
+    for col in FINANCIAL_COLUMNS:
+        if col not in frame.columns:
+            continue
+        lo, hi = frame[col].quantile([0.25, 0.75])
+        filters[f"filter.number.{col}"] = FilterState(numbers={col: (lo, hi)})
+    sample = rng.choice(frame['claim_number'].to_numpy(), size=min(100, len(frame)), replace=False)
+    filters['filter.claim_number'] = FilterState(claim_numbers=[str(n) for n in sample])
+    return filters
+
+
+# The charts of both dashboards built from the aggregates of state
+def build_figures(dataset, state):
+    status_counts = dataset.count_by(state, 'claim_status')
+    claims_over_time, resolution = reduce_time_series(
+        dataset.count_by_day(state), 'claim_received_date', 'claim_count')
+    monthly_status_counts = dataset.count_by_month(state, 'claim_status')
+    monthly_totals = monthly_status_counts.groupby('month_year')['count'].sum().reset_index()
+
+    figures = {
+        'status_bar': lambda: px.bar(status_counts, x='claim_status', y='count', color='claim_status'),
+        'time_line': lambda: px.line(claims_over_time, x='claim_received_date', y='claim_count',
+                                     title=f"Claims Over Time ({resolution})"),
+        'status_pie': lambda: px.pie(status_counts, names='claim_status', values='count', hole=0.3),
+        'lob_bar': lambda: px.bar(dataset.count_by(state, 'line_of_business'), y='line_of_business',
+                                  x='count', orientation='h', color='line_of_business'),
+        'trend_monthly': lambda: px.bar(monthly_status_counts, x='month_year', y='count', color='claim_status',
+                                        barmode='group').add_scatter(x=monthly_totals['month_year'],
+                                                                     y=monthly_totals['count'],
+                                                                     mode='lines+markers'),
+        'city_bar': lambda: city_bar(dataset, state),
+        'owner_bar': lambda: owner_bar(dataset, state),
+    }
+    return figures
+
+
+# The spec st.plotly_chart sends for figure. Streamlit serializes on every
+# call, cached figure or not, so this is the figure cost left on a rerun.
+def chart_spec(figure):
+    figure = plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True)
+    return plotly.io.to_json(figure, validate=False)
+
+
+# Time every stage of the dashboard pipeline on the CSV at path
+def benchmark_file(path, repeat, rng):
+    results = []
+
+    timed(results, 'load.csv', lambda: read_claims_csv(path, DASHBOARD_COLUMNS), 1)
+
+    def stream():
+        builder = CubeBuilder(TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+        frame, progress = stream_csv(path, DASHBOARD_COLUMNS, DATE_COLUMNS, CATEGORY_COLUMNS, [builder],
+                                     on_progress=None)
+        builder.build(frame)
+        return progress
+    progress = timed(results, 'load.streaming', stream, 1)
+    results[-1]['peak_resident_mb'] = progress.peak_resident_bytes / 2**20
+    raw_dates = pd.read_csv(path, usecols=DATE_COLUMNS, dtype=str)
+    for col in DATE_COLUMNS:
+        timed(results, f"parse_dates.{col}", lambda values=raw_dates[col]: parse_dates(values), repeat)
+    del raw_dates
+
+    signature = source_signature(path)
+    snapshot, store = snapshot_path(path), store_path(path)
+    _remove(snapshot)
+    _remove(store)
+    timed(results, 'load.snapshot_build', lambda: write_snapshot(path, snapshot, signature), 1)
+    timed(results, 'load.store_build', lambda: load_frame(path, signature, DASHBOARD_COLUMNS), 1)
+    frame = timed(results, 'load.store_open', lambda: load_frame(path, signature, DASHBOARD_COLUMNS), repeat)
+
+    def build_index():
+        index = FilterIndex(frame)
+        for col in TEXT_FILTER_COLUMNS:
+            index.text_rows(col, [])
+        for col in DATE_FILTER_COLUMNS:
+            bounds = date_bounds(frame[col])
+            if bounds is not None:
+                index.date_rows(col, *bounds)
+        for col in FINANCIAL_COLUMNS:
+            if col in frame.columns:
+                index.number_rows(col, 0, 0)
+        index.claim_number_rows([])
+        return index
+
+    index = timed(results, 'index.build', build_index, 1)
+    dataset = ClaimsDataset(frame, os.path.basename(path), index=index)
+    timed(results, 'cube.build', lambda: dataset.cube, 1)
+
+    filters = single_filters(dataset, rng)
+    for name, state in filters.items():
+        timed(results, name, lambda: dataset.index.mask(state), repeat)
+    combined = FilterState(
+        text={'line_of_business': filters['filter.text.line_of_business'].text['line_of_business']},
+        dates=dict(filters['filter.date.claim_received_date'].dates),
+    )
+    timed(results, 'filter.combined', lambda: dataset.index.mask(combined), repeat)
+
+    # Aggregates with no filters (answered by the cube), the combined filters
+    # and claim numbers (both counted from the rows)
+    states = {'all': FilterState(), 'combined': combined, 'claim_number': filters['filter.claim_number']}
+    for label, state in states.items():
+        dataset.mask(state)
+        aggregates = {
+            'count_claims': lambda: dataset.count_claims(state),
+            'count_by.claim_status': lambda: dataset.count_by(state, 'claim_status'),
+            'count_by.line_of_business': lambda: dataset.count_by(state, 'line_of_business'),
+            'count_by.loss_location_city': lambda: dataset.count_by(state, 'loss_location_city'),
+            'group_counts.owner': lambda: dataset.group_counts(
+                state, ['claim_owner_first_name', 'claim_owner_last_name'], 'claim_count'),
+            'count_by_day': lambda: dataset.count_by_day(state),
+            'count_by_month.claim_status': lambda: dataset.count_by_month(state, 'claim_status'),
+            'metrics': lambda: dataset.metrics(state),
+        }
+        for name, aggregate in aggregates.items():
+            timed(results, f"aggregate.{label}.{name}", aggregate, repeat)
+
+    # The cube against the row fallback on states it answers: no filters,
+    # the dashboards' starting state (every date filter at its full range)
+    # and a claim_status filter over whole months of claim_received_date.
+    # The dashboards route these states through the cube because it stays
+    # well ahead of counting the rows; each pair must also agree.
+    start = pd.Timestamp(dataset.date_bounds('claim_received_date')[0]) + pd.offsets.MonthBegin(1)
+    end = start + pd.DateOffset(months=24) - pd.Timedelta(days=1)
+    cube_states = {
+        'all': FilterState(),
+        'dashboard_default': FilterState(dates={col: dataset.date_bounds(col) for col in DATE_FILTER_COLUMNS
+                                                if dataset.date_bounds(col) is not None}),
+        'status_months': FilterState(text=dict(filters['filter.text.claim_status'].text),
+                                     dates={'claim_received_date': (start.date(), end.date())}),
+    }
+    for label, state in cube_states.items():
+        dataset.mask(state)
+        pairs = {
+            'count_by.claim_status': (lambda: dataset.cube.counts(state, 'claim_status'),
+                                      lambda: dataset._count_by_rows(state, 'claim_status')),
+            'count_by_day': (lambda: dataset.cube.daily(state), lambda: dataset._count_by_day_rows(state)),
+            'count_by_month.claim_status': (lambda: dataset.cube.monthly(state, 'claim_status'),
+                                            lambda: dataset._count_by_month_rows(state, 'claim_status')),
+        }
+        for name, (from_cube, from_rows) in pairs.items():
+            if from_cube() is None:
+                continue
+            answer = timed(results, f"cube.{label}.{name}", from_cube, repeat)
+            expected = timed(results, f"rows.{label}.{name}", from_rows, repeat)
+            if not answer.astype(str).equals(expected.astype(str)):
+                raise RuntimeError(f"cube and rows disagree on {label}.{name}")
+
+    if px is not None:
+        for name, build in build_figures(dataset, FilterState()).items():
+            figure = timed(results, f"figure.build.{name}", build, repeat)
+            timed(results, f"figure.serialize.{name}", lambda figure=figure: chart_spec(figure), repeat)
+
+    positions = np.flatnonzero(dataset.mask(FilterState()))
+    for fmt in EXPORT_FORMATS:
+        def export():
+            with export_rows(frame, positions, fmt) as exported:
+                exported.seek(0, os.SEEK_END)
+                return exported.tell()
+        name = re.sub(r'\W+', '_', fmt.lower()).strip('_')
+        timed(results, f"export.{name}", export, 1)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(DATA_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import pyarrow
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': pyarrow.__version__,
+    }
+
+
+# Compare report against baseline stage by stage; returns the regressions
+def compare(report, baseline, ratio=REGRESSION_RATIO):
+    regressions = []
+    before = {(run['rows'], stage['stage']): stage['seconds']
+              for run in baseline['runs'] for stage in run['stages']}
+    for run in report['runs']:
+        for stage in run['stages']:
+            previous = before.get((run['rows'], stage['stage']))
+            if previous is None or max(previous, stage['seconds']) < MIN_COMPARE_SECONDS:
+                continue
+            change = stage['seconds'] / previous if previous else float('inf')
+            if change > ratio:
+                regressions.append({'rows': run['rows'], 'stage': stage['stage'],
+                                    'baseline_seconds': previous, 'seconds': stage['seconds'], 'ratio': change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the claims dashboard pipeline headlessly")
+    parser.add_argument('--size', nargs='+', choices=list(SIZES), default=['10k'],
+                        help="synthetic dataset sizes to run")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage; the best is reported")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="where generated CSVs are kept between runs")
+    parser.add_argument('--output', help="JSON report path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    created = datetime.datetime.now(datetime.timezone.utc)
+    report = {'created': created.isoformat(), 'commit': git_commit(), 'environment': environment(), 'runs': []}
+    for size in args.size:
+        rows = SIZES[size]
+        path = os.path.join(args.data_dir, f"claims_{size}_seed{args.seed}.csv")
+        if not os.path.exists(path):
+            print(f"generating {rows:,} rows -> {path}", flush=True)
+            generate_claims_csv(path, rows, args.seed)
+        print(f"{size} ({rows:,} rows)", flush=True)
+        stages = benchmark_file(path, args.repeat, np.random.default_rng(args.seed))
+        # Covers every run so far; None where the platform cannot tell
+        peak = peak_rss()
+        report['runs'].append({
+            'size': size,
+            'rows': rows,
+            'csv_bytes': os.path.getsize(path),
+            'stages': stages,
+            'peak_rss_mb': peak / 2**20 if peak is not None else None,
+        })
+
+    output = args.output or os.path.join(os.path.dirname(DATA_DIR), 'results',
+                                         f"{created.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f))
+        for r in regressions:
+            print(f"REGRESSION {r['rows']:,} rows {r['stage']}: "
+                  f"{r['baseline_seconds'] * 1000:.1f} ms -> {r['seconds'] * 1000:.1f} ms ({r['ratio']:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Rows generated and written per step, so 10M-row files never sit in memory
+CHUNK_ROWS = 500_000
+FIRST_CLAIM_NUMBER = 10_000_000
+START_DATE = pd.Timestamp('2018-01-01')
+SPAN_DAYS = 6 * 365
+
+SOURCE_SYSTEMS = (['Guidewire', 'Legacy', 'Portal', 'Broker'], [0.55, 0.25, 0.15, 0.05])
+NATURES_OF_LOSS = (
+    ['Collision', 'Water Damage', 'Fire', 'Theft', 'Storm', 'Glass', 'Liability', 'Flood', 'Vandalism', 'Other'],
+    [0.25, 0.15, 0.08, 0.1, 0.12, 0.1, 0.06, 0.04, 0.05, 0.05],
+)
+LINES_OF_BUSINESS = (['Motor', 'Home', 'Commercial Property', 'Liability', 'Marine', 'Travel'],
+                     [0.4, 0.3, 0.12, 0.08, 0.05, 0.05])
+CLAIM_STATUSES = (['Open', 'Closed', 'Reopened'], [0.35, 0.6, 0.05])
+FAULT_RATINGS = (['At Fault', 'Not At Fault', 'Partial', 'Unknown'], [0.35, 0.4, 0.1, 0.15])
+FAULT_CATEGORISATIONS = (['Single Vehicle', 'Multi Vehicle', 'Third Party', 'Not Applicable'],
+                         [0.2, 0.3, 0.2, 0.3])
+CITY_COUNT = 2_000
+OWNER_COUNT = 400
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Harper', 'Rowan', 'Emerson', 'Parker', 'Reese', 'Skyler', 'Dakota', 'Hayden', 'Kendall', 'Logan']
+LAST_NAMES = ['Smith', 'Nguyen', 'Brown', 'Wilson', 'Taylor', 'Singh', 'Martin', 'Lee', 'Walker', 'Patel',
+              'White', 'Harris', 'Clark', 'Lewis', 'Young', 'King', 'Wright', 'Scott', 'Green', 'Baker']
+
+
+def _pick(rng, choices, size):
+    values, weights = choices
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=weights)]
+
+
+# Zipf-like weights so a few cities/owners dominate and the tail is long
+def _skewed(count):
+    weights = 1 / np.arange(1, count + 1) ** 0.8
+    return weights / weights.sum()
+
+
+def _format_dates(stamps, with_time):
+    formatted = pd.Series(stamps).dt.strftime('%Y-%m-%d %H:%M:%S' if with_time else '%Y-%m-%d')
+    return formatted.where(pd.notna(stamps), '')
+
+
+# One chunk of claims with the columns fetch_claims_data() and main() use.
+# Dates are ordered loss <= received <= finalised <= update, open claims have
+# no finalised date, and net incurred = paid + open reserves - recoveries.
+def generate_chunk(rng, start, size, cities, owners):
+    claim_number = np.arange(FIRST_CLAIM_NUMBER + start, FIRST_CLAIM_NUMBER + start + size)
+    status = _pick(rng, CLAIM_STATUSES, size)
+    is_open = status != 'Closed'
+
+    day = np.timedelta64(1, 'D')
+    received = START_DATE.to_datetime64().astype('datetime64[D]') + rng.integers(0, SPAN_DAYS, size) * day
+    loss = received - rng.geometric(0.08, size) * day
+    finalised = (received + rng.integers(5, 400, size) * day).astype('datetime64[s]')
+    finalised[is_open] = np.datetime64('NaT')
+    update = np.where(is_open, received + rng.integers(0, 120, size) * day,
+                      finalised.astype('datetime64[D]') + rng.integers(0, 30, size) * day)
+    seconds = np.timedelta64(1, 's')
+    verified_original = loss.astype('datetime64[s]') + rng.integers(0, 86_400, size) * seconds
+    verified_last = verified_original + rng.integers(0, 30 * 86_400, size) * seconds
+    has_catastrophe = rng.random(size) < 0.1
+    catastrophe_from = (loss - rng.integers(0, 5, size) * day).astype('datetime64[s]')
+    catastrophe_to = catastrophe_from + rng.integers(3, 30, size) * day
+    catastrophe_from[~has_catastrophe] = np.datetime64('NaT')
+    catastrophe_to[~has_catastrophe] = np.datetime64('NaT')
+
+    paid = np.round(rng.lognormal(8, 1.2, size), 2)
+    remaining_reserve = np.where(is_open, np.round(rng.lognormal(7.5, 1.3, size), 2), 0.0)
+    future_payment = np.where(is_open, np.round(rng.lognormal(6.5, 1.1, size), 2), 0.0)
+    recovery = np.where(rng.random(size) < 0.25, np.round(paid * rng.uniform(0.05, 0.6, size), 2), 0.0)
+    open_recovery = np.where(rng.random(size) < 0.3, np.round(paid * rng.uniform(0.05, 0.5, size), 2), 0.0)
+    net_incurred = np.round(paid + remaining_reserve + future_payment - recovery, 2)
+
+    owner = owners[rng.choice(len(owners), size=size, p=_skewed(len(owners)))]
+    return pd.DataFrame({
+        'claim_number': claim_number,
+        'policy_number': rng.integers(1_000_000, 9_999_999, size),
+        'source_system': _pick(rng, SOURCE_SYSTEMS, size),
+        'general_nature_of_loss': _pick(rng, NATURES_OF_LOSS, size),
+        'line_of_business': _pick(rng, LINES_OF_BUSINESS, size),
+        'claim_status': status,
+        'fault_rating': _pick(rng, FAULT_RATINGS, size),
+        'fault_categorisation': _pick(rng, FAULT_CATEGORISATIONS, size),
+        'loss_location_city': cities[rng.choice(len(cities), size=size, p=_skewed(len(cities)))],
+        'claim_owner_first_name': [name.split(' ')[0] for name in owner],
+        'claim_owner_last_name': [name.split(' ')[1] for name in owner],
+        'claim_received_date': _format_dates(received, False),
+        'claim_loss_date': _format_dates(loss, False),
+        'claim_finalised_date': _format_dates(finalised, False),
+        'original_verified_date_of_loss_time': _format_dates(verified_original, True),
+        'last_verified_date_of_loss_time': _format_dates(verified_last, True),
+        'catastrophe_valid_from_date_time': _format_dates(catastrophe_from, True),
+        'catastrophe_valid_to_date_time': _format_dates(catastrophe_to, True),
+        'update_date': _format_dates(update, False),
+        'total_open_recovery_reserve': open_recovery,
+        'total_open_remaining_reserve': remaining_reserve,
+        'total_open_future_payment': future_payment,
+        'total_recovery': recovery,
+        'total_net_incurred': net_incurred,
+        'total_paid': paid,
+    })
+
+
+# Write a reproducible synthetic Claims.csv of rows rows to path
+def generate_claims_csv(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    rng = np.random.default_rng(seed)
+    cities = np.asarray([f"City {i:04d}" for i in range(CITY_COUNT)], dtype=object)
+    owners = np.asarray(
+        [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+         for i in range(OWNER_COUNT)],
+        dtype=object,
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    for start in range(0, rows, chunk_rows):
+        chunk = generate_chunk(rng, start, min(chunk_rows, rows - start), cities, owners)
+        chunk.to_csv(tmp, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic Claims.csv")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_claims_csv(args.path, args.rows, args.seed)
@@ -0,0 +1,2 @@
+# Shared data layer for the claims report dashboards (app.py and
+# streamlit_claims_report_with_graph.py).
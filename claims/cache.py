@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+
+# Thread-safe LRU mapping bounded by entry count, and optionally by the total
+# of sizeof(value) over the entries, with hit/miss counters
+class LRUCache:
+    def __init__(self, maxsize=128, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        # Computed outside the lock; concurrent misses on one key may both
+        # compute, and the last one wins
+        value = compute()
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return value  # too large to keep
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def _discard(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self.nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+            if self.maxbytes is not None:
+                stats.update(evictions=self.evictions, nbytes=self.nbytes, maxbytes=self.maxbytes)
+            return stats
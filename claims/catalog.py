@@ -0,0 +1,232 @@
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# What is in each dashboard column, computed once per dataset version: the
+# distinct values of text columns with their counts, null counts, min/max
+# and a coarse histogram of date and number columns. Widgets are populated
+# from the catalog instead of scanning the columns on every rerun.
+
+# Equal-width bins in each histogram
+HISTOGRAM_BINS = 20
+# Text columns with more distinct values than this keep only their count
+MAX_CATALOG_VALUES = 100_000
+# Text columns with more distinct values than this are filtered through a
+# search box instead of a list of every value
+SEARCH_THRESHOLD = int(os.environ.get('CLAIMS_SEARCH_THRESHOLD', '200'))
+# Matching values offered per search
+SEARCH_LIMIT = 50
+
+
+# Histogram counts of values over HISTOGRAM_BINS equal-width bins spanning
+# lo..hi, with their edges
+def histogram(values, lo, hi, weights=None):
+    if hi <= lo:
+        hi = lo + 1
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(lo, hi), weights=weights)
+    return counts.astype(np.int64), edges
+
+
+# Dates are counted and binned as days since the epoch
+def epoch_days(stamps):
+    return stamps.astype('datetime64[D]').astype(np.int64)
+
+
+# min/max as JSON: dates as ISO strings, numbers as they are
+def _encode_bound(kind, value):
+    if value is None or pd.isnull(value):
+        return None
+    return str(value) if kind == 'date' else value
+
+
+def _decode_bound(kind, value):
+    return pd.Timestamp(value) if kind == 'date' and value is not None else value
+
+
+@dataclass
+class ColumnSummary:
+    name: str
+    kind: str  # 'text', 'date' or 'number'
+    rows: int
+    nulls: int
+    # Distinct non-null values; for number columns of catalogs merged from
+    # partitions this is an upper bound
+    distinct: int
+    # Claims per value of a text column (None when the column has more than
+    # MAX_CATALOG_VALUES values), or per day of a date column, in order
+    values: pd.Series = None
+    min: object = None
+    max: object = None
+    # (counts, edges) of a date or number column; date edges are in days
+    histogram: tuple = None
+    _search_keys: pd.Index = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def options(self):
+        return self.values.index.tolist() if self.kind == 'text' and self.values is not None else []
+
+    # (min, max) as datetime.date for a date column, or None without dates
+    @property
+    def bounds(self):
+        if self.min is None or pd.isnull(self.min):
+            return None
+        return pd.Timestamp(self.min).date(), pd.Timestamp(self.max).date()
+
+    # (min, max) of a number column, or None without values
+    @property
+    def range(self):
+        if self.kind != 'number' or self.min is None:
+            return None
+        return self.min, self.max
+
+    @property
+    def searchable(self):
+        return self.kind == 'text' and self.distinct > SEARCH_THRESHOLD
+
+    # Values containing query (case-insensitive), most frequent first
+    def search(self, query, limit=SEARCH_LIMIT):
+        if self.kind != 'text' or self.values is None:
+            return []
+        values = self.values
+        if query:
+            if self._search_keys is None:
+                self._search_keys = values.index.astype(str).str.lower()
+            values = values[self._search_keys.str.contains(query.lower(), regex=False)]
+        return values.iloc[np.argsort(-values.to_numpy(), kind='stable')[:limit]].index.tolist()
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'distinct': self.distinct,
+            'values': None if self.values is None else [self.values.index.tolist(), self.values.tolist()],
+            'min': _encode_bound(self.kind, self.min),
+            'max': _encode_bound(self.kind, self.max),
+            'histogram': None if self.histogram is None else [h.tolist() for h in self.histogram],
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        values = None if d['values'] is None else pd.Series(d['values'][1], index=d['values'][0], dtype=np.int64)
+        hist = None if d['histogram'] is None else (np.array(d['histogram'][0], dtype=np.int64),
+                                                    np.array(d['histogram'][1], dtype=float))
+        return cls(d['name'], d['kind'], d['rows'], d['nulls'], d['distinct'], values,
+                   _decode_bound(d['kind'], d['min']), _decode_bound(d['kind'], d['max']), hist)
+
+
+# Summaries from pre-aggregated counts, shared by the frame and SQL builders
+
+def text_summary(name, counts, nulls):
+    counts = counts[counts > 0]
+    values = counts.astype(np.int64).sort_index() if len(counts) <= MAX_CATALOG_VALUES else None
+    return ColumnSummary(name, 'text', int(counts.sum()) + nulls, nulls, len(counts), values)
+
+
+# day_counts: claims per day, indexed by days since the epoch
+def date_summary(name, day_counts, nulls):
+    day_counts = day_counts[day_counts > 0].astype(np.int64).sort_index()
+    days = day_counts.index.to_numpy(dtype=np.int64)
+    rows = int(day_counts.sum()) + nulls
+    if not len(days):
+        return ColumnSummary(name, 'date', rows, nulls, 0, day_counts)
+    lo, hi = days[0], days[-1]
+    return ColumnSummary(name, 'date', rows, nulls, len(days), day_counts,
+                         min=pd.Timestamp(np.datetime64(int(lo), 'D')), max=pd.Timestamp(np.datetime64(int(hi), 'D')),
+                         histogram=histogram(days, lo, hi + 1, day_counts.to_numpy()))
+
+
+def summarize_column(values):
+    name = values.name
+    nulls = int(values.isna().sum())
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.array.codes
+        counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+        return text_summary(name, pd.Series(counts, index=values.cat.categories), nulls)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        stamps = values.to_numpy()
+        return date_summary(name, pd.Series(epoch_days(stamps[~np.isnat(stamps)])).value_counts(), nulls)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        numbers = numbers[np.isfinite(numbers)]
+        if not len(numbers):
+            return ColumnSummary(name, 'number', len(values), nulls, 0)
+        lo, hi = numbers.min(), numbers.max()
+        return ColumnSummary(name, 'number', len(values), nulls, len(pd.unique(numbers)),
+                             min=lo.item(), max=hi.item(), histogram=histogram(numbers, lo, hi))
+    return text_summary(name, values.value_counts(), nulls)
+
+
+# Summary of one column over the rows of all the given summaries of it.
+# Text and date summaries merge exactly; number histograms are re-binned
+# over the combined range by bin centre.
+def merge_summaries(summaries):
+    first = summaries[0]
+    nulls = sum(s.nulls for s in summaries)
+    if first.kind in ('text', 'date') and all(s.values is not None for s in summaries):
+        counts = pd.concat([s.values for s in summaries]).groupby(level=0).sum()
+        return (text_summary if first.kind == 'text' else date_summary)(first.name, counts, nulls)
+    rows, distinct = sum(s.rows for s in summaries), sum(s.distinct for s in summaries)
+    if first.kind == 'text':
+        return ColumnSummary(first.name, 'text', rows, nulls, distinct)
+
+    with_values = [s for s in summaries if s.histogram is not None]
+    if not with_values:
+        return ColumnSummary(first.name, first.kind, rows, nulls, 0)
+    edges = [s.histogram[1] for s in with_values]
+    centres = np.concatenate([(e[:-1] + e[1:]) / 2 for e in edges])
+    weights = np.concatenate([s.histogram[0] for s in with_values])
+    return ColumnSummary(first.name, first.kind, rows, nulls, distinct, None,
+                         min(s.min for s in with_values), max(s.max for s in with_values),
+                         histogram(centres, min(e[0] for e in edges), max(e[-1] for e in edges), weights))
+
+
+# Column summaries of one dataset version
+class DatasetCatalog:
+    def __init__(self, version, summaries):
+        self.version = version
+        self.summaries = {summary.name: summary for summary in summaries}
+
+    def __contains__(self, col):
+        return col in self.summaries
+
+    def __getitem__(self, col):
+        return self.summaries[col]
+
+    def options(self, col):
+        return self.summaries[col].options
+
+    def date_bounds(self, col):
+        return self.summaries[col].bounds
+
+    # One row per column: kind, nulls, distinct values, min and max
+    def describe(self):
+        return pd.DataFrame([
+            {'column': s.name, 'kind': s.kind, 'rows': s.rows, 'nulls': s.nulls, 'distinct': s.distinct,
+             'min': s.min, 'max': s.max}
+            for s in self.summaries.values()
+        ])
+
+    def to_dict(self):
+        return {'version': self.version, 'columns': [s.to_dict() for s in self.summaries.values()]}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['version'], [ColumnSummary.from_dict(s) for s in d['columns']])
+
+
+def build_catalog(frame, version=None, columns=None):
+    columns = [col for col in (columns or frame.columns) if col in frame.columns]
+    return DatasetCatalog(version, [summarize_column(frame[col]) for col in columns])
+
+
+# Catalog over the rows of all the given catalogs (e.g. one per partition)
+def merge_catalogs(catalogs, version=None):
+    columns = {}
+    for catalog in catalogs:
+        for col, summary in catalog.summaries.items():
+            columns.setdefault(col, []).append(summary)
+    return DatasetCatalog(version, [merge_summaries(summaries) for summaries in columns.values()])
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+# Low-cardinality text columns stored dictionary-encoded
+CATEGORY_COLUMNS = [
+    'source_system', 'general_nature_of_loss', 'line_of_business', 'claim_status',
+    'fault_rating', 'fault_categorisation', 'loss_location_city',
+    'claim_owner_first_name', 'claim_owner_last_name'
+]
+
+
+# Convert the text columns present in df to categoricals in place
+def encode_categories(df, columns=CATEGORY_COLUMNS):
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+# value_counts for a categorical column via bincount over its codes; only
+# categories that actually occur are returned, most frequent first
+def count_values(values, name='count'):
+    codes = values.array.codes
+    counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+    present = np.flatnonzero(counts)
+    order = present[np.argsort(-counts[present], kind='stable')]
+    return pd.DataFrame({
+        values.name: values.cat.categories[order],
+        name: counts[order],
+    })
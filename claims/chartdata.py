@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Chart data is reduced before a figure is built, so the size of each
+# figure's JSON (and the time to serialize and render it) is bounded no
+# matter how many distinct values or days the filtered claims have.
+
+# Bars shown by the ranked category charts (city, claim owner); the rest
+# are rolled up into one "Other" bar
+TOP_N = int(os.environ.get('CLAIMS_CHART_TOP_N', '20'))
+# Most data points in any one figure, across all of its traces
+FIGURE_POINT_BUDGET = int(os.environ.get('CLAIMS_FIGURE_POINT_BUDGET', '5000'))
+# Line traces with more points than this are drawn with WebGL
+WEBGL_MIN_POINTS = 1000
+
+
+# The n largest rows of counts by value_col, followed by a single row
+# rolling up the rest, labelled "Other (k more)". n is capped so the result
+# stays within the figure point budget.
+def top_n(counts, label_col, value_col, n=TOP_N):
+    n = max(1, min(n, FIGURE_POINT_BUDGET - 1))
+    if len(counts) <= n + 1:
+        order = np.argsort(-counts[value_col].to_numpy(), kind='stable')
+        return counts.iloc[order][[label_col, value_col]].reset_index(drop=True)
+    values = counts[value_col].to_numpy()
+    top = np.argpartition(-values, n - 1)[:n]
+    top = top[np.argsort(-values[top], kind='stable')]
+    rest = len(counts) - n
+    other = pd.DataFrame({label_col: [f"Other ({rest:,} more)"],
+                          value_col: [values.sum() - values[top].sum()]})
+    ranked = counts.iloc[top][[label_col, value_col]]
+    ranked[label_col] = ranked[label_col].astype(str)
+    return pd.concat([ranked, other], ignore_index=True)
+
+
+# 'webgl' for line traces too long to draw as SVG, else 'svg'
+def render_mode(points):
+    return 'webgl' if points > WEBGL_MIN_POINTS else 'svg'
@@ -0,0 +1,120 @@
+import plotly.express as px
+
+from claims.chartdata import TOP_N, render_mode, top_n
+from claims.timeseries import AUTO, DEFAULT_MAX_POINTS, reduce_time_series
+
+# The dashboard charts, built from a source and a FilterState. Shared by
+# app.py, streamlit_claims_report_with_graph.py and the batch report
+# (claims.report), so each chart is defined once.
+
+
+def _background(fig):
+    fig.update_layout(
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#f0f2f6",
+    )
+    return fig
+
+
+def status_bar(source, state):
+    status_counts = source.count_by(state, 'claim_status')
+    return _background(px.bar(
+        status_counts, x='claim_status', y='count', title="Claims by Status",
+        color='claim_status', color_discrete_sequence=px.colors.sequential.Plasma
+    ))
+
+
+def claims_over_time_line(source, state, mode=AUTO, max_points=DEFAULT_MAX_POINTS):
+    claims_over_time, resolution = reduce_time_series(
+        source.count_by_day(state), 'claim_received_date', 'claim_count',
+        mode=mode, max_points=max_points
+    )
+    return _background(px.line(
+        claims_over_time, x='claim_received_date', y='claim_count',
+        title=f"Claims Over Time ({resolution})", color_discrete_sequence=px.colors.sequential.Viridis,
+        render_mode=render_mode(len(claims_over_time))
+    ))
+
+
+def status_pie(source, state):
+    status_counts = source.count_by(state, 'claim_status')
+    return _background(px.pie(
+        status_counts, names='claim_status', values='count', title="Claim Status Distribution", hole=0.3
+    ))
+
+
+def line_of_business_bar(source, state):
+    line_of_business_counts = source.count_by(state, 'line_of_business')
+    fig = px.bar(
+        line_of_business_counts,
+        y='line_of_business',
+        x='count',
+        orientation='h',
+        title="Claims by Line of Business",
+        color='line_of_business'
+    )
+    _background(fig).update_layout(showlegend=False)
+    fig.update_xaxes(title="Count")
+    fig.update_yaxes(title="Line of Business")
+    return fig
+
+
+# Claims per month and status as grouped bars, with the monthly total as a
+# trend line
+def trend_monthly(source, state):
+    # Claims per 'YYYY-MM' month of claim_received_date and status
+    monthly_status_counts = source.count_by_month(state, 'claim_status')
+    fig = px.bar(
+        monthly_status_counts,
+        x='month_year',
+        y='count',
+        color='claim_status',
+        title="Monthly Claim Status Trend (Open vs Closed)",
+        barmode='group'
+    )
+
+    monthly_totals = monthly_status_counts.groupby('month_year')['count'].sum().reset_index()
+    fig.add_scatter(
+        x=monthly_totals['month_year'],
+        y=monthly_totals['count'],
+        mode='lines+markers',
+        name='Total Claims Trend',
+        line=dict(color='blue', width=2)
+    )
+
+    _background(fig).update_layout(
+        xaxis_title="Month-Year",
+        yaxis_title="Number of Claims",
+        xaxis_tickangle=-45
+    )
+    return fig
+
+
+# Ranked counts of a high-cardinality column as one bar trace: the top
+# values, each in its own colour, and a grey "Other" bar for the rest. A
+# single trace with per-bar colours replaces one trace (and legend entry)
+# per value.
+def _ranked_bar(counts, label_col, value_col, title, n):
+    distinct = len(counts)
+    ranked = top_n(counts, label_col, value_col, n)
+    palette = px.colors.qualitative.Plotly
+    colors = [palette[i % len(palette)] for i in range(len(ranked))]
+    if len(ranked) < distinct:
+        title = f"{title}: top {len(ranked) - 1} of {distinct:,}"
+        colors[-1] = 'lightgrey'
+    fig = px.bar(ranked, x=label_col, y=value_col, title=title)
+    fig.update_traces(marker_color=colors)
+    fig.update_xaxes(type='category')
+    return fig
+
+
+def city_bar(source, state, n=TOP_N):
+    city_counts = source.count_by(state, 'loss_location_city')
+    return _ranked_bar(city_counts, 'loss_location_city', 'count', "Claims by Loss Location (City)", n)
+
+
+def owner_bar(source, state, n=TOP_N):
+    owner_counts = source.group_counts(state, ['claim_owner_first_name', 'claim_owner_last_name'], 'claim_count')
+    owner_counts = owner_counts.assign(claim_owner=owner_counts['claim_owner_first_name'].astype(str) + ' '
+                                       + owner_counts['claim_owner_last_name'].astype(str))
+    return _ranked_bar(owner_counts, 'claim_owner', 'claim_count', "Claims by Claim Owner", n)
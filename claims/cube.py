@@ -0,0 +1,294 @@
+import numpy as np
+import pandas as pd
+
+from claims.dates import month_labels
+
+# Month bucket used for a missing claim_received_date
+NO_MONTH = -1
+
+
+# Distinct values of an int64 key array with their counts, by bincount when
+# the keys are dense enough and by sorting otherwise
+def _tally(keys):
+    if not len(keys):
+        return keys[:0], np.zeros(0, dtype=np.int64)
+    lo, hi = keys.min(), keys.max()
+    if hi - lo < max(1 << 20, 4 * len(keys)):
+        counts = np.bincount(keys - lo)
+        present = np.flatnonzero(counts)
+        return present + lo, counts[present]
+    return np.unique(keys, return_counts=True)
+
+
+def _day(value):
+    return np.datetime64(pd.Timestamp(value), 'D').astype(np.int64)
+
+
+def _month(day):
+    return np.datetime64(int(day), 'D').astype('datetime64[M]').astype(np.int64) + 1970 * 12
+
+
+# Bit of each filter column in a row's missing mask
+def _bits(text_columns, other_dates):
+    return {col: 1 << i for i, col in enumerate(list(text_columns) + list(other_dates))}
+
+
+# Cells and column statistics of a block of rows: claims per (month, code,
+# missing) of each text column, claims per (claim_received_date day,
+# missing) and (min, max) per other date column. missing is a bitmask of the
+# filter columns (see _bits) a row has no value in, so a filter keeping
+# every value of a column, which only drops its missing rows, is answered
+# by dropping the cells with that bit set. Blocks merge by adding cells, so
+# a rollup can be built chunk by chunk or patched with the rows an upsert
+# removes (sign=-1) and adds.
+class RollupBlock:
+    def __init__(self, frame, text_columns, other_dates, time_column, sign=1):
+        self.sign = sign
+        stamps = frame[time_column].to_numpy(dtype='datetime64[D]')
+        dated = ~np.isnat(stamps)
+        months = np.full(len(frame), NO_MONTH, dtype=np.int64)
+        months[dated] = stamps[dated].astype('datetime64[M]').astype(np.int64) + 1970 * 12
+        bits = _bits(text_columns, other_dates)
+        missing = np.zeros(len(frame), dtype=np.int64)
+        for col, bit in bits.items():
+            missing[frame[col].isna().to_numpy()] |= bit
+        patterns = 1 << len(bits)
+
+        self.months = {}
+        for col in text_columns:
+            codes = frame[col].array.codes.astype(np.int64)
+            present = codes >= 0
+            stride = max(len(frame[col].cat.categories), 1)
+            keys, counts = _tally(((months[present] + 1) * stride + codes[present]) * patterns + missing[present])
+            cells = keys // patterns
+            self.months[col] = pd.DataFrame({'month': cells // stride - 1, 'code': cells % stride,
+                                             'missing': keys % patterns, 'count': sign * counts})
+        keys, counts = _tally(stamps[dated].astype(np.int64) * patterns + missing[dated])
+        self.days = pd.DataFrame({'day': keys // patterns, 'missing': keys % patterns, 'count': sign * counts})
+        self.dates = {col: (frame[col].min(), frame[col].max()) for col in other_dates}
+
+    # One block holding the cells and statistics of all of blocks. Bounds
+    # only widen: rows removed by an upsert do not narrow them, and a stale
+    # bound just sends full-range filters to the row fallback.
+    @staticmethod
+    def merge(blocks):
+        merged = object.__new__(RollupBlock)
+        merged.sign = 1
+        merged.months = {
+            col: _sum_cells([block.months[col] for block in blocks], ['month', 'code', 'missing'])
+            for col in blocks[0].months
+        }
+        merged.days = _sum_cells([block.days for block in blocks], ['day', 'missing'])
+        merged.dates = {}
+        for col in blocks[0].dates:
+            bounds = pd.Series([value for block in blocks if block.sign > 0 for value in block.dates[col]])
+            merged.dates[col] = (bounds.min(), bounds.max())
+        return merged
+
+    @property
+    def nbytes(self):
+        cells = list(self.months.values()) + [self.days]
+        return sum(int(frame.memory_usage(index=False).sum()) for frame in cells)
+
+
+def _sum_cells(cells, dims):
+    cells = pd.concat(cells, ignore_index=True).groupby(dims)['count'].sum()
+    return cells[cells != 0].reset_index()
+
+
+# Cells sorted by dims (then missing) summed over missing
+def _collapse(cells, dims):
+    if not len(cells):
+        return cells[dims + ['count']].reset_index(drop=True)
+    keys = cells[dims].to_numpy()
+    starts = np.flatnonzero(np.concatenate(([True], (keys[1:] != keys[:-1]).any(axis=1))))
+    collapsed = cells[dims].iloc[starts].reset_index(drop=True)
+    collapsed['count'] = np.add.reduceat(cells['count'].to_numpy(), starts)
+    return collapsed
+
+
+# Claim counts rolled up for the dashboard charts. Each rollup is only as
+# large as the chart it answers, so reading it beats counting the filtered
+# rows:
+#   - claims per claim_received_date month and value, for each text filter
+#     column (Claims by Status, by Line of Business, the monthly trend)
+#   - claims per claim_received_date day (Claims Over Time)
+#
+# A rollup answers state when every filter is one it can apply: a text
+# filter on the charted column, a claim_received_date range (of whole
+# months for the monthly rollups), or a filter that keeps every present
+# value, i.e. every value of a text column or the full range of a date
+# column, and so only drops the rows missing that column. The dashboards
+# send a full range for every date column by default, so that state is
+# answered here. Any other filter (part of another text column, a narrower
+# range of another date column, number ranges, claim numbers) makes rollups
+# return None and callers count the filtered rows instead.
+class ClaimsCube:
+    def __init__(self, frame, text_columns, date_columns, time_column='claim_received_date'):
+        text_columns = [col for col in text_columns if col in frame.columns]
+        other_dates = [col for col in date_columns if col != time_column and col in frame.columns]
+        self._assign(frame, time_column, RollupBlock(frame, text_columns, other_dates, time_column))
+
+    def _assign(self, frame, time_column, block):
+        self.time_column = time_column
+        self.text_columns = list(block.months)
+        self.other_dates = list(block.dates)
+        self.categories = {col: frame[col].cat.categories for col in self.text_columns}
+        self.bits = _bits(self.text_columns, self.other_dates)
+        self.block = block
+        days = block.days['day'].to_numpy()
+        self.first_day, self.last_day = (days[0], days[-1]) if len(days) else (None, None)
+
+    @classmethod
+    def from_block(cls, frame, time_column, block):
+        cube = object.__new__(cls)
+        cube._assign(frame, time_column, block)
+        return cube
+
+    # Cube for frame after the rows in removed were replaced by the rows in
+    # added (both in frame's categories): only the delta is rolled up and
+    # merged into the existing cells
+    def updated(self, frame, removed, added):
+        blocks = [self.block]
+        for rows, sign in ((removed, -1), (added, 1)):
+            blocks.append(RollupBlock(rows, self.text_columns, self.other_dates, self.time_column, sign))
+        return ClaimsCube.from_block(frame, self.time_column, RollupBlock.merge(blocks))
+
+    def __len__(self):
+        return sum(len(cells) for cells in self.block.months.values()) + len(self.block.days)
+
+    # Whether a text filter keeps every value of a column
+    def _selects_all(self, col, selected):
+        categories = self.categories[col]
+        codes = categories.get_indexer(pd.Index(selected, dtype=categories.dtype))
+        return len(np.unique(codes[codes >= 0])) == len(categories)
+
+    # Missing mask of the columns whose rows the filters of state other than
+    # those on col and on the time column drop, or None when one of those
+    # filters drops present values too
+    def _dropped(self, state, col=None):
+        if state.has_claim_filter or state.numbers:
+            return None
+        dropped = 0
+        for other, selected in state.text.items():
+            if other == col:
+                continue
+            if other not in self.categories or not self._selects_all(other, selected):
+                return None
+            dropped |= self.bits[other]
+        for other, (start, end) in state.dates.items():
+            if other == self.time_column:
+                continue
+            if other not in self.block.dates:
+                return None
+            lo, hi = self.block.dates[other]
+            # A column with no values at all loses every row to its filter
+            if not pd.isnull(lo) and (pd.Timestamp(start) > lo or pd.Timestamp(end) < hi):
+                return None
+            dropped |= self.bits[other]
+        return dropped
+
+    @staticmethod
+    def _kept(cells, dropped):
+        return (cells['missing'].to_numpy() & dropped) == 0
+
+    # Cells of col matching state, or None if state cannot be answered from
+    # the rollup; collapsed to one cell per (month, code) unless the caller
+    # sums them itself
+    def _month_cells(self, state, col, collapse=True):
+        dropped = None if col not in self.categories else self._dropped(state, col)
+        if dropped is None:
+            return None
+        cells = self.block.months[col]
+        mask = self._kept(cells, dropped)
+        if self.time_column in state.dates:
+            start, end = (_day(value) for value in state.dates[self.time_column])
+            months = cells['month'].to_numpy()
+            mask &= months != NO_MONTH
+            # Ends inside the data must fall on month boundaries
+            if self.first_day is not None and start > self.first_day:
+                if _month(start - 1) == _month(start):
+                    return None
+                mask &= months >= _month(start)
+            if self.last_day is not None and end < self.last_day:
+                if _month(end + 1) == _month(end):
+                    return None
+                mask &= months <= _month(end)
+        if col in state.text:
+            categories = self.categories[col]
+            codes = categories.get_indexer(pd.Index(state.text[col], dtype=categories.dtype))
+            mask &= np.isin(cells['code'].to_numpy(), codes[codes >= 0])
+        return _collapse(cells[mask], ['month', 'code']) if collapse else cells[mask]
+
+    # Claims per value of a text column, most frequent first
+    def counts(self, state, col):
+        cells = self._month_cells(state, col, collapse=False)
+        if cells is None:
+            return None
+        totals = np.bincount(cells['code'].to_numpy(), weights=cells['count'].to_numpy(),
+                             minlength=len(self.categories[col])).astype(np.int64)
+        codes = np.flatnonzero(totals)
+        codes = codes[np.argsort(-totals[codes], kind='stable')]
+        return pd.DataFrame({col: self.categories[col][codes], 'count': totals[codes]})
+
+    # Claims per 'YYYY-MM' month and value of a text column
+    def monthly(self, state, col):
+        cells = self._month_cells(state, col)
+        if cells is None:
+            return None
+        cells = cells[cells['month'] != NO_MONTH]
+        return pd.DataFrame({
+            'month_year': month_labels(cells['month'].to_numpy()),
+            col: self.categories[col][cells['code'].to_numpy()],
+            'count': cells['count'].to_numpy(),
+        })
+
+    # Claims per claim_received_date day, in date order
+    def daily(self, state, name='claim_count'):
+        dropped = self._dropped(state)
+        if dropped is None:
+            return None
+        cells = self.block.days
+        cells = cells[self._kept(cells, dropped)]
+        if self.time_column in state.dates:
+            start, end = (_day(value) for value in state.dates[self.time_column])
+            days = cells['day'].to_numpy()
+            cells = cells[(days >= start) & (days <= end)]
+        cells = _collapse(cells, ['day'])
+        return pd.DataFrame({
+            self.time_column: cells['day'].to_numpy().astype('datetime64[D]').astype('datetime64[us]'),
+            name: cells['count'].to_numpy(),
+        })
+
+
+# ClaimsCube built chunk by chunk while an extract is streamed in (see
+# claims.ingest). Chunks must share category codes, which only grow by
+# appending, so each chunk is rolled up on arrival and only the cells stay
+# resident; the rows are never needed together.
+class CubeBuilder:
+    # Partial blocks merged into one after this many chunks
+    MERGE_EVERY = 8
+
+    def __init__(self, text_columns, date_columns, time_column='claim_received_date'):
+        self.text_columns = text_columns
+        self.date_columns = date_columns
+        self.time_column = time_column
+        self._pending = []
+
+    def add(self, chunk):
+        text_columns = [col for col in self.text_columns if col in chunk.columns]
+        other_dates = [col for col in self.date_columns if col != self.time_column and col in chunk.columns]
+        self._pending.append(RollupBlock(chunk, text_columns, other_dates, self.time_column))
+        if len(self._pending) > self.MERGE_EVERY:
+            self._pending = [RollupBlock.merge(self._pending)]
+
+    # Cells kept so far, in bytes
+    @property
+    def nbytes(self):
+        return sum(block.nbytes for block in self._pending)
+
+    # The finished cube for frame, the concatenation of every chunk added
+    def build(self, frame):
+        if not self._pending:
+            return ClaimsCube(frame, self.text_columns, self.date_columns, self.time_column)
+        return ClaimsCube.from_block(frame, self.time_column, RollupBlock.merge(self._pending))
@@ -0,0 +1,524 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from claims.cache import LRUCache
+from claims.catalog import build_catalog
+from claims.categories import CATEGORY_COLUMNS, count_values, encode_categories
+from claims.cube import ClaimsCube, CubeBuilder
+from claims.dates import month_index, month_labels, parse_dates
+from claims.export import deferred_export, iter_chunks
+from claims.index import FilterIndex
+from claims.ingest import stream_csv, streams
+from claims.metrics import FINANCIAL_COLUMNS, compute_metrics
+from claims.store import STORE_SUFFIX, open_store, write_store
+from claims.table import descending, sort_order
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # snapshots are optional; fall back to parsing the CSV
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Default extract used by both dashboards
+CLAIMS_CSV = 'Claims.csv'
+
+# Date columns parsed on load
+DATE_COLUMNS = [
+    'claim_received_date', 'claim_loss_date', 'claim_finalised_date',
+    'original_verified_date_of_loss_time', 'last_verified_date_of_loss_time',
+    'catastrophe_valid_from_date_time', 'catastrophe_valid_to_date_time', 'update_date'
+]
+
+# Columns behind the sidebar filters
+TEXT_FILTER_COLUMNS = [
+    'source_system', 'general_nature_of_loss', 'line_of_business', 'claim_status',
+    'fault_rating', 'fault_categorisation'
+]
+DATE_FILTER_COLUMNS = [
+    'claim_received_date', 'claim_loss_date', 'claim_finalised_date',
+    'original_verified_date_of_loss_time', 'last_verified_date_of_loss_time',
+    'catastrophe_valid_from_date_time', 'catastrophe_valid_to_date_time'
+]
+
+# Columns plotted by the charts
+CHART_COLUMNS = ['loss_location_city', 'claim_owner_first_name', 'claim_owner_last_name']
+
+# Last-modified stamp used as the high-water mark for incremental refresh
+UPDATE_COLUMN = 'update_date'
+
+# Everything the dashboards read; other columns stay on disk in the snapshot
+DASHBOARD_COLUMNS = (
+    ['claim_number'] + TEXT_FILTER_COLUMNS + DATE_FILTER_COLUMNS + CHART_COLUMNS
+    + FINANCIAL_COLUMNS + [UPDATE_COLUMN]
+)
+
+# When set, a changed source is applied to the cached dataset as an upsert of
+# the rows updated since its high-water mark instead of a full reload. Rows
+# deleted from the source are not detected in this mode.
+INCREMENTAL_REFRESH = os.environ.get('CLAIMS_INCREMENTAL', '') not in ('', '0')
+# Rows per chunk when scanning the CSV for changed rows
+CHANGES_CHUNK_ROWS = 200_000
+
+# Columnar snapshot written next to the CSV on first read
+SNAPSHOT_SUFFIX = '.snapshot.parquet'
+# Parquet metadata key recording which CSV version a snapshot was built from
+SNAPSHOT_SOURCE_KEY = b'claims_source'
+# Bumped whenever the snapshot layout changes so old snapshots get rebuilt
+SNAPSHOT_VERSION = 2
+
+# Serve loaded datasets from a memory-mapped Arrow store shared by all
+# sessions and processes on the host; set CLAIMS_SHARED_STORE=0 to keep them
+# on the heap instead
+SHARED_STORE = os.environ.get('CLAIMS_SHARED_STORE', '1') != '0'
+
+# Filter bitmaps kept per dataset (one byte per row each)
+SELECTION_CACHE_SIZE = 4
+
+
+# A loaded claims frame together with the structures derived from it. The
+# frame is shared between sessions and must be treated as read-only.
+class ClaimsDataset:
+    def __init__(self, frame, version=None, index=None, cube=None):
+        self.frame = frame
+        self.version = version
+        self.index = index if index is not None else FilterIndex(frame)
+        self._cube = cube
+        self._catalog = None
+        self._masks = LRUCache(maxsize=SELECTION_CACHE_SIZE)
+        self._orders = {}
+        self._sorted = LRUCache(maxsize=SELECTION_CACHE_SIZE)
+        self._lock = threading.Lock()
+
+    @property
+    def empty(self):
+        return self.frame.empty
+
+    @property
+    def columns(self):
+        return list(self.frame.columns)
+
+    # Pre-aggregated claim counts, built on first use
+    @property
+    def cube(self):
+        with self._lock:
+            if self._cube is None:
+                self._cube = ClaimsCube(self.frame, TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+            return self._cube
+
+    # Column catalog (distinct values, null counts, bounds, histograms),
+    # built on first use
+    @property
+    def catalog(self):
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = build_catalog(self.frame, self.version)
+            return self._catalog
+
+    # Build every derived structure now rather than on first use, so the
+    # first rerun served from this dataset pays none of it
+    def warm(self):
+        self.index.warm(TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS, FINANCIAL_COLUMNS)
+        self.cube
+        self.catalog
+        return self
+
+    # Latest update_date in the dataset; rows stamped on or after it are
+    # re-read by an incremental refresh
+    @property
+    def high_water(self):
+        if UPDATE_COLUMN not in self.frame.columns:
+            return None
+        high_water = self.frame[UPDATE_COLUMN].max()
+        return high_water if pd.notnull(high_water) else None
+
+    # New dataset with changes upserted by claim_number: existing claims are
+    # overwritten in place of their old rows and new claims are appended.
+    # The filter index and cube are patched with the affected rows only.
+    def upsert(self, changes, version=None):
+        frame = self.frame
+        changes = changes.drop_duplicates('claim_number', keep='last')
+        changes = changes.reindex(columns=frame.columns)
+
+        # Extend categories at the end so existing codes stay valid
+        frame = frame.copy(deep=False)
+        for col in frame.columns:
+            if isinstance(frame[col].dtype, pd.CategoricalDtype):
+                new_values = pd.Index(changes[col].dropna().unique()).difference(frame[col].cat.categories)
+                if len(new_values):
+                    frame[col] = frame[col].cat.add_categories(new_values)
+                changes[col] = pd.Categorical(changes[col], dtype=frame[col].dtype)
+            else:
+                changes[col] = changes[col].astype(frame[col].dtype)
+
+        positions = pd.Series(np.arange(len(frame)), index=frame['claim_number'].to_numpy())
+        positions = positions[~positions.index.duplicated(keep='last')]
+        positions = positions.reindex(changes['claim_number'].to_numpy()).fillna(-1).astype(np.int64).to_numpy()
+        existing = positions >= 0
+        removed = frame.iloc[positions[existing]]
+
+        appended = changes[~existing]
+        updated_frame = pd.concat([frame, appended], ignore_index=True)
+        for j, col in enumerate(updated_frame.columns):
+            updated_frame.iloc[positions[existing], j] = changes[col].to_numpy()[existing]
+        changed = np.concatenate((positions[existing], np.arange(len(frame), len(updated_frame))))
+
+        with self._lock:
+            cube = self._cube
+        if cube is not None:
+            cube = cube.updated(updated_frame, removed, updated_frame.iloc[changed])
+        index = self.index.updated(updated_frame, changed)
+        logger.info("upserted %d changed and %d new claims", existing.sum(), len(appended))
+        return ClaimsDataset(updated_frame, version, index=index, cube=cube)
+
+    # Query interface shared with the SQL source (claims.sql.SqlSource).
+    # Aggregates are rolled up from the cube when it can answer state and
+    # otherwise computed from just the needed columns of the matching rows.
+
+    # Widget options and defaults, served from the catalog
+
+    def options(self, col):
+        return self.catalog.options(col)
+
+    def date_bounds(self, col):
+        return self.catalog.date_bounds(col)
+
+    # Bitmap of rows passing state; the last few are kept so the charts,
+    # metrics and table of one rerun resolve the filters only once
+    def mask(self, state):
+        return self._masks.get_or_compute(state.key(), lambda: self.index.mask(state))
+
+    # Rows passing every filter in state, materialized once
+    def select(self, state):
+        return self.frame[self.mask(state)]
+
+    def rows(self, state, limit=None):
+        if limit is None:
+            return self.select(state)
+        return self.frame.iloc[np.flatnonzero(self.mask(state))[:limit]]
+
+    # Full-table sort order of col (nulls last), computed once per column
+    def sort_order(self, col, ascending=True):
+        with self._lock:
+            order = self._orders.get(col)
+        if order is None:
+            order = sort_order(self.frame[col])
+            with self._lock:
+                self._orders[col] = order
+        return order[0] if ascending else descending(*order)
+
+    # Positions of the rows passing state in display order; the last few are
+    # kept so moving between pages only slices them
+    def _sorted_positions(self, state, sort_by, ascending):
+        def compute():
+            mask = self.mask(state)
+            if sort_by is None:
+                return np.flatnonzero(mask)
+            order = self.sort_order(sort_by, ascending)
+            return order[mask[order]]
+        return self._sorted.get_or_compute((state.key(), sort_by, ascending), compute)
+
+    # One page (0-based) of the rows passing state, sorted by sort_by, and
+    # the number of matching rows
+    def page(self, state, page, page_size, sort_by=None, ascending=True):
+        positions = self._sorted_positions(state, sort_by, ascending)
+        start = page * page_size
+        return self.frame.iloc[positions[start:start + page_size]], len(positions)
+
+    def _column(self, state, col):
+        return self.frame[col][self.mask(state)]
+
+    def count_claims(self, state):
+        return self._column(state, 'claim_number').nunique()
+
+    # Claims per value of col, most frequent first
+    def count_by(self, state, col):
+        counts = self.cube.counts(state, col)
+        return counts if counts is not None else self._count_by_rows(state, col)
+
+    # Claims per combination of columns, in key order
+    def group_counts(self, state, columns, name='count'):
+        rows = self.frame.loc[self.mask(state), columns]
+        return rows.groupby(columns, observed=True).size().reset_index(name=name)
+
+    # Claims per claim_received_date day
+    def count_by_day(self, state, name='claim_count'):
+        counts = self.cube.daily(state, name)
+        return counts if counts is not None else self._count_by_day_rows(state, name)
+
+    # Claims per 'YYYY-MM' month of claim_received_date and value of col
+    def count_by_month(self, state, col):
+        counts = self.cube.monthly(state, col)
+        return counts if counts is not None else self._count_by_month_rows(state, col)
+
+    # The same aggregates counted from the matching rows, for states the cube
+    # cannot answer (and timed against it by the benchmarks)
+
+    def _count_by_rows(self, state, col):
+        return count_values(self._column(state, col))
+
+    def _count_by_day_rows(self, state, name='claim_count'):
+        return self.group_counts(state, ['claim_received_date'], name)
+
+    def _count_by_month_rows(self, state, col):
+        rows = self.frame.loc[self.mask(state), ['claim_received_date', col]]
+        month = month_index(rows['claim_received_date']).rename('month')
+        counts = rows.groupby([month, col], observed=True).size().reset_index(name='count')
+        counts.insert(0, 'month_year', month_labels(counts.pop('month')))
+        return counts
+
+    def metrics(self, state):
+        columns = ['claim_number'] + [col for col in FINANCIAL_COLUMNS if col in self.frame.columns]
+        return compute_metrics(self.frame.loc[self.mask(state), columns])
+
+    def export_callable(self, state, fmt):
+        def chunks():
+            yield from iter_chunks(self.frame, np.flatnonzero(self.mask(state)))
+        return deferred_export(chunks, fmt)
+
+
+# Bounded LRU of loaded claims datasets, keyed by the source file signature.
+# Datasets handed out by the cache are shared between reruns and sessions.
+class DatasetCache:
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Cached value for key, or loader(previous) on a miss, where previous is
+    # the entry for an older version of the same source and columns (or None)
+    def get(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                logger.debug("dataset cache hit: %s", key)
+                return self._entries[key]
+
+            self.misses += 1
+            logger.info("dataset cache miss: %s", key)
+            # Older snapshots of the same source can never be hit again
+            stale_keys = [k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]]
+            previous = next((self._entries[k] for k in reversed(stale_keys) if k[3:] == key[3:]), None)
+            for stale in stale_keys:
+                self._evict(stale)
+            value = loader(previous)
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._evict(next(iter(self._entries)))
+            return value
+
+    def _evict(self, key):
+        del self._entries[key]
+        self.evictions += 1
+        logger.info("dataset cache evict: %s", key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+_cache = DatasetCache(maxsize=int(os.environ.get('CLAIMS_CACHE_SIZE', 2)))
+
+
+# Identify a version of the source file by path, mtime and size
+def source_signature(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+# Parse the claims extract from CSV
+def read_claims_csv(path, columns=None):
+    # Text columns are dictionary-encoded while parsing
+    dtype = {col: 'category' for col in CATEGORY_COLUMNS}
+    if columns is not None:
+        df = pd.read_csv(path, usecols=lambda c: c in columns, dtype=dtype)
+    else:
+        df = pd.read_csv(path, dtype=dtype)
+
+    # Ensure date columns are in the correct format
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    return df
+
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+
+
+# The signature stored in a snapshot, or None if it is missing or unreadable
+def _snapshot_source(snapshot):
+    try:
+        metadata = pq.read_schema(snapshot).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return metadata.get(SNAPSHOT_SOURCE_KEY)
+
+
+def _encode_signature(signature):
+    return f"v{SNAPSHOT_VERSION}:{signature[1]}:{signature[2]}".encode()
+
+
+# Convert the whole CSV into a typed Parquet snapshot with dates decoded.
+# Written to a temporary file and renamed so readers never see a partial file.
+def write_snapshot(path, snapshot, signature):
+    df = read_claims_csv(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SNAPSHOT_SOURCE_KEY] = _encode_signature(signature)
+    table = table.replace_schema_metadata(metadata)
+
+    tmp = f"{snapshot}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, snapshot)
+    except OSError as e:
+        logger.warning("could not write snapshot %s: %s", snapshot, e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return df
+
+
+# Read the dashboard columns, going through the Parquet snapshot when pyarrow
+# is available and building it from the CSV if it is missing or out of date
+def read_claims(path, signature, columns=None):
+    if pq is None:
+        return read_claims_csv(path, columns)
+
+    snapshot = snapshot_path(path)
+    if _snapshot_source(snapshot) != _encode_signature(signature):
+        logger.info("building snapshot %s from %s", snapshot, path)
+        df = write_snapshot(path, snapshot, signature)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    if columns is not None:
+        available = set(pq.read_schema(snapshot).names)
+        columns = [c for c in columns if c in available]
+    return encode_categories(pd.read_parquet(snapshot, columns=columns))
+
+
+def store_path(path):
+    return os.path.splitext(path)[0] + STORE_SUFFIX
+
+
+def _store_source(signature, columns):
+    return _encode_signature(signature) + b':' + ','.join(columns or ['*']).encode()
+
+
+# The dashboard frame for one version of the source. By default it is served
+# from the memory-mapped shared store, which is (re)built from the snapshot
+# when it is missing or stale; the heap copy used to build it is released.
+def load_frame(path, signature, columns=None):
+    if not SHARED_STORE or pa is None:
+        return read_claims(path, signature, columns)
+
+    store = store_path(path)
+    source = _store_source(signature, columns)
+    frame = open_store(store, source)
+    if frame is None:
+        logger.info("building shared store %s from %s", store, path)
+        frame = read_claims(path, signature, columns)
+        if write_store(frame, store, source):
+            frame = open_store(store, source)
+    return frame
+
+
+# Dataset for an extract too large to parse in one go, streamed chunk by
+# chunk with its cube aggregated on the way (see claims.ingest). The shared
+# store is written from the streamed frame, and reused by later loads, but
+# no Parquet snapshot is built.
+def stream_dataset(path, signature, version, columns=None):
+    store, source = store_path(path), _store_source(signature, columns)
+    if SHARED_STORE and pa is not None:
+        frame = open_store(store, source)
+        if frame is not None:
+            return ClaimsDataset(frame, version)
+
+    logger.info("streaming %s in chunks", path)
+    builder = CubeBuilder(TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+    frame, _ = stream_csv(path, columns, DATE_COLUMNS, CATEGORY_COLUMNS, sinks=[builder])
+    if frame.empty:
+        return ClaimsDataset(frame, version)
+    cube = builder.build(frame)
+    if SHARED_STORE and pa is not None and write_store(frame, store, source):
+        # Serve the mapped copy and let the heap one go
+        mapped = open_store(store, source)
+        if mapped is not None:
+            frame = mapped
+    return ClaimsDataset(frame, version, cube=cube)
+
+
+# Rows of the CSV whose update_date is on or after since, scanned in chunks so
+# only the changed rows are parsed and kept. update_date has day resolution,
+# so rows from the high-water day itself are re-read and upserted again.
+def read_changes(path, since, columns=None):
+    usecols = (lambda c: c in columns) if columns is not None else None
+    changed = []
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=CHANGES_CHUNK_ROWS):
+        stamps = parse_dates(chunk[UPDATE_COLUMN])
+        chunk = chunk[(stamps >= since).to_numpy()]
+        if len(chunk):
+            changed.append(chunk)
+    if not changed:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(changed, ignore_index=True)
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    return df
+
+
+# Bring previous up to date with the source by upserting the rows changed
+# since its high-water mark
+def refresh_dataset(previous, path, version):
+    since = previous.high_water
+    changes = read_changes(path, since, list(previous.frame.columns))
+    logger.info("incremental refresh of %s: %d rows updated since %s", path, len(changes), since)
+    return previous.upsert(changes, version)
+
+
+# Load the claims extract once per process and reuse it until the file
+# changes. With incremental refresh, a changed file is applied to the
+# previously loaded version instead of being re-read in full; extracts over
+# the streaming threshold are read in bounded chunks.
+def load_dataset(path=CLAIMS_CSV, columns=DASHBOARD_COLUMNS, incremental=None):
+    if incremental is None:
+        incremental = INCREMENTAL_REFRESH
+    signature = source_signature(path)
+    key = signature + (tuple(columns) if columns is not None else None,)
+    version = f"{os.path.basename(path)}@{signature[1]}:{signature[2]}"
+
+    def load(previous):
+        if incremental and previous is not None and previous.high_water is not None:
+            return refresh_dataset(previous, path, version)
+        if streams(path):
+            return stream_dataset(path, signature, version, columns)
+        return ClaimsDataset(load_frame(path, signature, columns), version)
+
+    return _cache.get(key, load)
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,60 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Explicit formats for columns whose layout is known up front; any other
+# column has its format guessed once from a sample of its values
+DATE_FORMATS = {}
+
+# Number of non-null values used to guess a column's format
+FORMAT_SAMPLE_SIZE = 200
+
+
+# Guess a single strftime format that parses every value in the sample
+def guess_date_format(values):
+    sample = values.dropna().astype(str).head(FORMAT_SAMPLE_SIZE)
+    if sample.empty:
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        fmt = guess_datetime_format(sample.iloc[0])
+    if fmt is None:
+        return None
+    parsed = pd.to_datetime(sample, format=fmt, errors='coerce')
+    return fmt if parsed.notna().all() else None
+
+
+# Parse a raw column into datetime64 at day resolution. Times of day are
+# dropped so that date widgets select whole days, as .dt.date used to.
+def parse_dates(values, fmt=None):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.normalize()
+    fmt = fmt or DATE_FORMATS.get(values.name) or guess_date_format(values)
+    if fmt is not None:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    else:
+        parsed = pd.to_datetime(values, format='mixed', errors='coerce')
+    return parsed.dt.normalize()
+
+
+# (min, max) of a date column as datetime.date for st.date_input, or None
+# when the column has no dates at all
+def date_bounds(values):
+    min_date, max_date = values.min(), values.max()
+    if pd.isnull(min_date) or pd.isnull(max_date):
+        return None
+    return min_date.date(), max_date.date()
+
+
+# Integer month bucket (year * 12 + month - 1); NaT stays missing so that
+# groupby drops it
+def month_index(values):
+    return (values.dt.year * 12 + values.dt.month - 1).astype('Int64')
+
+
+# 'YYYY-MM' labels for month buckets, in the format Period('M') prints
+def month_labels(months):
+    months = np.asarray(months, dtype=np.int64)
+    return [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in months]
@@ -0,0 +1,84 @@
+import gzip
+import io
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is offered only when pyarrow is installed
+    pa = pq = None
+
+# Rows converted and written per step; bounds the memory used by an export
+EXPORT_CHUNK_ROWS = 100_000
+# Exports stay in memory up to this size, then spill to a temporary file
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# Export format -> (file name, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('filtered_claims.csv', 'text/csv'),
+    'CSV (gzip)': ('filtered_claims.csv.gz', 'application/gzip'),
+}
+if pq is not None:
+    EXPORT_FORMATS['Parquet'] = ('filtered_claims.parquet', 'application/vnd.apache.parquet')
+
+
+# Successive slices of frame at the given row positions
+def iter_chunks(frame, positions, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(positions), chunk_rows):
+        yield frame.iloc[positions[start:start + chunk_rows]]
+
+
+def write_csv(chunks, fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='', write_through=True)
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(text, index=False, header=header)
+        header = False
+    text.detach()
+
+
+# The file schema is schema when given, else that of the first chunk; chunks
+# whose inferred types may vary (e.g. a column all missing in one chunk)
+# need an explicit schema
+def write_parquet(chunks, fileobj, schema=None):
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(fileobj, table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+# Write chunks (an iterable of DataFrames) in fmt to a spooled temporary
+# file and return it rewound for reading
+def export_chunks(chunks, fmt, schema=None):
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    if fmt == 'CSV':
+        write_csv(chunks, spool)
+    elif fmt == 'CSV (gzip)':
+        with gzip.GzipFile(fileobj=spool, mode='wb') as compressed:
+            write_csv(chunks, compressed)
+    elif fmt == 'Parquet' and pq is not None:
+        write_parquet(chunks, spool, schema)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    spool.seek(0)
+    return spool
+
+
+def export_rows(frame, positions, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    return export_chunks(iter_chunks(frame, positions, chunk_rows), fmt)
+
+
+# Deferred export for st.download_button: make_chunks is only called, and
+# the file only generated, when the button is clicked. Chunking bounds the
+# memory used to convert the rows, not the payload: Streamlit serves
+# downloads from memory, so the finished file is read back into one bytes
+# object and held whole. The compressed formats keep that copy small.
+def deferred_export(make_chunks, fmt, schema=None):
+    def generate():
+        with export_chunks(make_chunks(), fmt, schema) as exported:
+            return exported.read()
+    return generate
@@ -0,0 +1,65 @@
+import hashlib
+import os
+
+import numpy as np
+
+from claims.cache import LRUCache
+
+# Built plotly figures are kept per process, bounded by count and by the size
+# of their data, so a repeated dashboard state skips both the aggregation and
+# the figure construction behind each chart
+FIGURE_CACHE_SIZE = int(os.environ.get('CLAIMS_FIGURE_CACHE_SIZE', '256'))
+FIGURE_CACHE_BYTES = int(os.environ.get('CLAIMS_FIGURE_CACHE_MB', '64')) * 2**20
+
+
+# Approximate size of a figure's properties: the bytes of its data arrays
+# plus the length of its strings, without serializing it
+def _value_bytes(value):
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(len(key) + _value_bytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return sum(_value_bytes(item) for item in value)
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+
+def _spec_bytes(figure):
+    traces = sum(_value_bytes(trace.to_plotly_json()) for trace in figure.data)
+    return traces + _value_bytes(figure.layout.to_plotly_json())
+
+
+_cache = LRUCache(maxsize=FIGURE_CACHE_SIZE, maxbytes=FIGURE_CACHE_BYTES, sizeof=_spec_bytes)
+
+
+# Canonical fingerprint of a chart: the dataset version, the chart name, the
+# filter state and the chart's own options (resolution, point budget, ...)
+def figure_key(version, chart, state, options=()):
+    canonical = repr((version, chart, state.key(), tuple(options)))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# The figure build(source, state, *options) returns for chart, built once per
+# fingerprint. Figures are shared between sessions, so build must return a
+# finished figure and callers must not modify it.
+#
+# st.plotly_chart still serializes the figure on every rerun and takes no
+# prebuilt spec, so that part is not cached. The point budgets keep it small:
+# the figure.serialize.* benchmark stages, which time exactly what
+# st.plotly_chart does, take 1-5 ms per chart at 1M rows (1.3 ms for a
+# 5,000-point daily series), against 25-115 ms to build the same figures.
+def cached_figure(source, chart, state, build, options=()):
+    if source.version is None:
+        return build(source, state, *options)
+    key = figure_key(source.version, chart, state, options)
+    return _cache.get_or_compute(key, lambda: build(source, state, *options))
+
+
+def figure_cache_stats():
+    return _cache.stats()
+
+
+def clear_figure_cache():
+    _cache.clear()
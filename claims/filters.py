@@ -0,0 +1,58 @@
+import re
+from dataclasses import dataclass, field
+
+# Claim-number box syntax: claim numbers separated by commas; ABC* for every
+# claim number starting with ABC; 1000..2000 for the numeric range,
+# inclusive. A hyphen is part of the claim number (2023-0001), never a range.
+_RANGE = re.compile(r'^(\d+)\s*\.\.\s*(\d+)$')
+
+
+# Claim numbers are matched stripped and case-insensitively
+def normalize_claim_number(value):
+    return str(value).strip().upper()
+
+
+# Filter selections from the sidebar. Only filters that actually restrict
+# the data are recorded: text values per column, inclusive (start, end)
+# date ranges per column, inclusive (lo, hi) ranges per number column and
+# the claim-number box (exact claim numbers, prefixes and inclusive numeric
+# ranges, any of which may match).
+@dataclass
+class FilterState:
+    claim_numbers: list = field(default_factory=list)
+    text: dict = field(default_factory=dict)
+    dates: dict = field(default_factory=dict)
+    claim_prefixes: list = field(default_factory=list)
+    claim_ranges: list = field(default_factory=list)
+    numbers: dict = field(default_factory=dict)
+
+    @property
+    def has_claim_filter(self):
+        return bool(self.claim_numbers or self.claim_prefixes or self.claim_ranges)
+
+    # Fill the claim-number filters from the text box
+    def parse_claim_query(self, query):
+        for token in query.split(','):
+            token = normalize_claim_number(token)
+            if not token.rstrip('*'):
+                continue
+            match = _RANGE.match(token)
+            if token.endswith('*'):
+                self.claim_prefixes.append(token.rstrip('*'))
+            elif match:
+                lo, hi = sorted((int(match.group(1)), int(match.group(2))))
+                self.claim_ranges.append((lo, hi))
+            else:
+                self.claim_numbers.append(token)
+        return self
+
+    # Canonical hashable form, independent of selection order
+    def key(self):
+        return (
+            tuple(sorted(set(self.claim_numbers))),
+            tuple(sorted((col, tuple(sorted(map(str, values)))) for col, values in self.text.items())),
+            tuple(sorted((col, str(start), str(end)) for col, (start, end) in self.dates.items())),
+            tuple(sorted(set(self.claim_prefixes))),
+            tuple(sorted(set(self.claim_ranges))),
+            tuple(sorted((col, float(lo), float(hi)) for col, (lo, hi) in self.numbers.items())),
+        )
@@ -0,0 +1,336 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from claims.filters import normalize_claim_number
+
+
+# Row positions for every distinct value of a categorical column, stored
+# CSR-style: rows sorted by code, with offsets[c]:offsets[c + 1] spanning
+# the rows holding code c
+class ValuePostings:
+    def __init__(self, values):
+        self.categories = values.cat.categories
+        codes = values.array.codes
+        present = codes >= 0
+        self.rows = np.flatnonzero(present)[np.argsort(codes[present], kind='stable')]
+        counts = np.bincount(codes[present], minlength=len(self.categories))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def lookup(self, selected):
+        codes = self.categories.get_indexer(pd.Index(selected, dtype=self.categories.dtype))
+        codes = np.unique(codes[codes >= 0])
+        return np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in codes] or [np.empty(0, np.int64)])
+
+    # Postings for values after the rows in changed were rewritten or
+    # appended. Untouched rows keep their order and the changed rows are
+    # merged in by (code, row), so no full re-sort is needed.
+    def updated(self, values, changed):
+        entry_codes = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        keep = ~np.isin(self.rows, changed)
+        rows, entry_codes = self.rows[keep], entry_codes[keep]
+
+        new_rows = np.sort(changed)
+        new_codes = values.array.codes.astype(np.int64)[new_rows]
+        new_rows, new_codes = new_rows[new_codes >= 0], new_codes[new_codes >= 0]
+        order = np.argsort(new_codes, kind='stable')
+        new_rows, new_codes = new_rows[order], new_codes[order]
+
+        size = len(values)
+        at = np.searchsorted(entry_codes * size + rows, new_codes * size + new_rows)
+        merged = object.__new__(ValuePostings)
+        merged.categories = values.cat.categories
+        merged.rows = np.insert(rows, at, new_rows)
+        counts = np.bincount(np.insert(entry_codes, at, new_codes), minlength=len(merged.categories))
+        merged.offsets = np.concatenate(([0], np.cumsum(counts)))
+        return merged
+
+
+# Row positions of a datetime64 column ordered by date, NaT excluded
+class SortedDates:
+    def __init__(self, values):
+        stamps = values.to_numpy(dtype='datetime64[ns]')
+        present = np.flatnonzero(~np.isnat(stamps))
+        order = np.argsort(stamps[present], kind='stable')
+        self.rows = present[order]
+        self.stamps = stamps[present][order]
+
+    def lookup(self, start, end):
+        lo = np.searchsorted(self.stamps, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        hi = np.searchsorted(self.stamps, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return self.rows[lo:hi]
+
+    # Sorted positions for values after the rows in changed were rewritten
+    # or appended, merged in by date without re-sorting the untouched rows
+    def updated(self, values, changed):
+        keep = ~np.isin(self.rows, changed)
+        rows, stamps = self.rows[keep], self.stamps[keep]
+
+        new_rows = np.sort(changed)
+        new_stamps = values.to_numpy(dtype='datetime64[ns]')[new_rows]
+        present = ~np.isnat(new_stamps)
+        order = np.argsort(new_stamps[present], kind='stable')
+        new_rows, new_stamps = new_rows[present][order], new_stamps[present][order]
+
+        at = np.searchsorted(stamps, new_stamps, side='right')
+        merged = object.__new__(SortedDates)
+        merged.rows = np.insert(rows, at, new_rows)
+        merged.stamps = np.insert(stamps, at, new_stamps)
+        return merged
+
+
+# Row positions of a numeric column ordered by value, NaN excluded
+class SortedNumbers:
+    def __init__(self, values):
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        present = np.flatnonzero(~np.isnan(numbers))
+        order = np.argsort(numbers[present], kind='stable')
+        self.rows = present[order]
+        self.numbers = numbers[present][order]
+
+    def lookup(self, lo, hi):
+        start = np.searchsorted(self.numbers, lo, side='left')
+        end = np.searchsorted(self.numbers, hi, side='right')
+        return self.rows[start:end]
+
+    # Sorted positions for values after the rows in changed were rewritten
+    # or appended, merged in by value without re-sorting the untouched rows
+    def updated(self, values, changed):
+        keep = ~np.isin(self.rows, changed)
+        rows, numbers = self.rows[keep], self.numbers[keep]
+
+        new_rows = np.sort(changed)
+        new_numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)[new_rows]
+        present = ~np.isnan(new_numbers)
+        order = np.argsort(new_numbers[present], kind='stable')
+        new_rows, new_numbers = new_rows[present][order], new_numbers[present][order]
+
+        at = np.searchsorted(numbers, new_numbers, side='right')
+        merged = object.__new__(SortedNumbers)
+        merged.rows = np.insert(rows, at, new_rows)
+        merged.numbers = np.insert(numbers, at, new_numbers)
+        return merged
+
+
+# Sorted keys with their rows, less the stale rows, merged with sorted new
+# keys and rows without re-sorting
+def _merge_sorted(keys, rows, stale, new_keys, new_rows):
+    keep = ~stale[rows]
+    keys, rows = keys[keep], rows[keep]
+    at = np.searchsorted(keys, new_keys, side='right')
+    return np.insert(keys, at, new_keys), np.insert(rows, at, new_rows)
+
+
+# Rows for each (start, end) span of positions into rows, concatenated
+def _spans(rows, starts, ends):
+    lengths = ends - starts
+    if not len(lengths):
+        return rows[:0]
+    if (lengths == 1).all():
+        return rows[starts]
+    shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return rows[np.arange(lengths.sum()) + shifts]
+
+
+# Claim numbers in sorted order with their row positions. Exact claim
+# numbers are found through a hash table of the distinct values, so a
+# pasted list of k claims costs O(k); prefixes and numeric ranges are
+# binary searches over the sorted values. A numeric column is indexed as
+# integers, anything else as normalized (stripped, upper-case) text.
+class ClaimNumberIndex:
+    def __init__(self, values):
+        self.numeric = pd.api.types.is_numeric_dtype(values.dtype)
+        keys, positions = self._keys(values, np.arange(len(values)))
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.rows = keys[order], positions[order]
+        numbers, number_rows = self._numbers(self.keys, self.rows)
+        order = np.argsort(numbers, kind='stable')
+        self.numbers, self.number_rows = numbers[order], number_rows[order]
+        self._find_distinct()
+
+    # Keys of the claim numbers at positions, skipping missing ones
+    def _keys(self, values, positions):
+        values = values.iloc[positions]
+        present = values.notna().to_numpy()
+        if self.numeric:
+            return values.to_numpy()[present].astype(np.int64), positions[present]
+        return values[present].map(normalize_claim_number).to_numpy(dtype=object), positions[present]
+
+    # Keys that read as integers, for range queries, with their rows
+    def _numbers(self, keys, rows):
+        if self.numeric:
+            return keys, rows
+        numbers = pd.to_numeric(pd.Series(keys, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        integral = np.flatnonzero(np.isfinite(numbers) & (numbers == np.round(numbers)))
+        return numbers[integral].astype(np.int64), rows[integral]
+
+    # Spans of each distinct key in the sorted keys, and the hash table of
+    # the distinct keys used by lookup
+    def _find_distinct(self):
+        if len(self.keys):
+            starts = np.flatnonzero(np.concatenate(([True], self.keys[1:] != self.keys[:-1])))
+        else:
+            starts = np.array([], dtype=np.int64)
+        self.offsets = np.concatenate((starts, [len(self.keys)]))
+        self.distinct = pd.Index(self.keys[starts])
+
+    # Index for values after the rows in changed were rewritten or appended.
+    # Only the changed claim numbers are sorted; they are merged into the
+    # sorted keys and numbers of the untouched rows, and the spans and hash
+    # table of distinct keys are rebuilt from the merged keys in one pass.
+    # A column that changes between numeric and text is indexed afresh.
+    def updated(self, values, changed):
+        if pd.api.types.is_numeric_dtype(values.dtype) != self.numeric:
+            return ClaimNumberIndex(values)
+        stale = np.zeros(len(values), dtype=bool)
+        stale[changed] = True
+        new_keys, new_rows = self._keys(values, np.sort(changed))
+        order = np.argsort(new_keys, kind='stable')
+        new_keys, new_rows = new_keys[order], new_rows[order]
+
+        merged = object.__new__(ClaimNumberIndex)
+        merged.numeric = self.numeric
+        merged.keys, merged.rows = _merge_sorted(self.keys, self.rows, stale, new_keys, new_rows)
+        numbers, number_rows = self._numbers(new_keys, new_rows)
+        order = np.argsort(numbers, kind='stable')
+        merged.numbers, merged.number_rows = _merge_sorted(
+            self.numbers, self.number_rows, stale, numbers[order], number_rows[order])
+        merged._find_distinct()
+        return merged
+
+    def _key(self, claim_number):
+        claim_number = normalize_claim_number(claim_number)
+        if not self.numeric:
+            return claim_number
+        try:
+            return int(claim_number)
+        except ValueError:
+            return None
+
+    def lookup(self, claim_numbers):
+        keys = [key for key in map(self._key, claim_numbers) if key is not None]
+        found = self.distinct.get_indexer(pd.Index(keys, dtype=self.distinct.dtype)) if keys else np.array([], int)
+        found = found[found >= 0]
+        return _spans(self.rows, self.offsets[found], self.offsets[found + 1])
+
+    def prefix(self, prefix):
+        prefix = normalize_claim_number(prefix)
+        if not self.numeric:
+            lo = np.searchsorted(self.keys, prefix, side='left')
+            hi = np.searchsorted(self.keys, prefix + '\U0010ffff', side='left')
+            return self.rows[lo:hi]
+        if not prefix.isdigit() or (prefix.startswith('0') and prefix != '0'):
+            return self.rows[:0]
+        # Integers starting with the digits p are p, p0-p9, p00-p99, ...
+        starts, ends = [], []
+        base, width = int(prefix), 1
+        while self.numbers.size and base * width <= self.numbers[-1]:
+            starts.append(np.searchsorted(self.numbers, base * width, side='left'))
+            ends.append(np.searchsorted(self.numbers, (base + 1) * width - 1, side='right'))
+            if base == 0:
+                break
+            width *= 10
+        return _spans(self.number_rows, np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+    def range(self, lo, hi):
+        start = np.searchsorted(self.numbers, lo, side='left')
+        end = np.searchsorted(self.numbers, hi, side='right')
+        return self.number_rows[start:end]
+
+
+# Filter index built once per dataset. Each filter resolves to a row set
+# from the precomputed postings; the row sets are intersected as boolean
+# bitmaps so the frame is only materialized once, after all filters.
+# The claim-number index is built with the dataset, per-column structures
+# on first use.
+class FilterIndex:
+    def __init__(self, frame):
+        self.frame = frame
+        self.size = len(frame)
+        self._postings = {}
+        self.claim_numbers = ClaimNumberIndex(frame['claim_number']) if 'claim_number' in frame.columns else None
+        self._lock = threading.Lock()
+
+    def _get(self, col, build):
+        with self._lock:
+            if col not in self._postings:
+                self._postings[col] = build(self.frame[col])
+            return self._postings[col]
+
+    # Build the postings of the given filter columns up front
+    def warm(self, text_columns, date_columns, number_columns=()):
+        for col in text_columns:
+            if col in self.frame.columns:
+                self._get(col, ValuePostings)
+        for col in date_columns:
+            if col in self.frame.columns:
+                self._get(col, SortedDates)
+        for col in number_columns:
+            if col in self.frame.columns:
+                self._get(col, SortedNumbers)
+
+    # Index over frame after the rows at positions changed were rewritten or
+    # appended; the claim-number index and postings built so far are
+    # patched rather than rebuilt
+    def updated(self, frame, changed):
+        index = object.__new__(FilterIndex)
+        index.frame = frame
+        index.size = len(frame)
+        index._postings = {}
+        index.claim_numbers = None
+        if 'claim_number' in frame.columns:
+            index.claim_numbers = (ClaimNumberIndex(frame['claim_number']) if self.claim_numbers is None
+                                   else self.claim_numbers.updated(frame['claim_number'], changed))
+        index._lock = threading.Lock()
+        with self._lock:
+            for col, postings in self._postings.items():
+                index._postings[col] = postings.updated(frame[col], changed)
+        return index
+
+    def _bitmap(self, rows):
+        bitmap = np.zeros(self.size, dtype=bool)
+        bitmap[rows] = True
+        return bitmap
+
+    def text_rows(self, col, selected):
+        return self._get(col, ValuePostings).lookup(selected)
+
+    def date_rows(self, col, start, end):
+        return self._get(col, SortedDates).lookup(start, end)
+
+    def number_rows(self, col, lo, hi):
+        return self._get(col, SortedNumbers).lookup(lo, hi)
+
+    def claim_number_rows(self, claim_numbers):
+        return self.claim_numbers.lookup(claim_numbers)
+
+    # Rows matching any of the claim numbers, prefixes and ranges in state
+    def claim_rows(self, state):
+        index = self.claim_numbers
+        row_sets = [index.lookup(state.claim_numbers)]
+        row_sets += [index.prefix(prefix) for prefix in state.claim_prefixes]
+        row_sets += [index.range(lo, hi) for lo, hi in state.claim_ranges]
+        return np.unique(np.concatenate(row_sets))
+
+    # Boolean bitmap of the rows passing every filter in state
+    def mask(self, state):
+        row_sets = []
+        if state.has_claim_filter:
+            row_sets.append(self.claim_rows(state))
+        for col, selected in state.text.items():
+            row_sets.append(self.text_rows(col, selected))
+        for col, (start, end) in state.dates.items():
+            row_sets.append(self.date_rows(col, start, end))
+        for col, (lo, hi) in state.numbers.items():
+            row_sets.append(self.number_rows(col, lo, hi))
+
+        mask = np.ones(self.size, dtype=bool)
+        # Smallest row sets first so the bitmap empties out early
+        for rows in sorted(row_sets, key=len):
+            if len(rows) == self.size:
+                continue
+            mask &= self._bitmap(rows)
+            if not mask.any():
+                break
+        return mask
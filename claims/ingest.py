@@ -0,0 +1,196 @@
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from claims.dates import DATE_FORMATS, guess_date_format, parse_dates
+
+try:
+    import resource
+except ImportError:  # no peak RSS outside Unix; the other counters still apply
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Extracts too large to parse in one go are streamed through a generator
+# pipeline instead: the CSV is read in bounded chunks, each chunk has its
+# dates parsed and its text columns encoded against a shared vocabulary, is
+# folded into the pre-aggregates and then reduced to the compact columns the
+# dashboards keep. Raw text never exists for more than one chunk at a time.
+INGEST_CHUNK_ROWS = int(os.environ.get('CLAIMS_INGEST_CHUNK_ROWS', '100000'))
+# CSVs of at least this many MB are streamed; 0 streams every extract
+STREAMING_THRESHOLD_MB = int(os.environ.get('CLAIMS_STREAMING_MB', '256'))
+
+
+def streams(path):
+    return os.path.getsize(path) >= STREAMING_THRESHOLD_MB * 2**20
+
+
+# Peak resident set size of the process in bytes, or None where unknown
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# Progress of one streamed load, updated after every chunk. resident_bytes
+# counts the columns kept so far plus the aggregates fed from them.
+@dataclass
+class IngestProgress:
+    path: str
+    total_bytes: int
+    rows: int = 0
+    chunks: int = 0
+    bytes_read: int = 0
+    resident_bytes: int = 0
+    peak_resident_bytes: int = 0
+    peak_rss_bytes: int = None
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def fraction(self):
+        return min(1.0, self.bytes_read / self.total_bytes) if self.total_bytes else 1.0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def update(self, rows, bytes_read, resident_bytes):
+        self.rows += rows
+        self.chunks += 1
+        self.bytes_read = bytes_read
+        self.resident_bytes = resident_bytes
+        self.peak_resident_bytes = max(self.peak_resident_bytes, resident_bytes)
+        self.peak_rss_bytes = peak_rss()
+
+    def summary(self):
+        return {
+            'path': self.path,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'seconds': self.elapsed,
+            'rows_per_second': self.rows / self.elapsed if self.elapsed else None,
+            'resident_bytes': self.resident_bytes,
+            'peak_resident_bytes': self.peak_resident_bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+        }
+
+
+def log_progress(progress):
+    rss = f"{progress.peak_rss_bytes / 2**20:,.0f} MB" if progress.peak_rss_bytes is not None else "n/a"
+    logger.info("streamed %s: %.0f%%, %d rows in %d chunks, %.1fs; resident %.1f MB (peak %.1f MB), peak RSS %s",
+                progress.path, 100 * progress.fraction, progress.rows, progress.chunks, progress.elapsed,
+                progress.resident_bytes / 2**20, progress.peak_resident_bytes / 2**20, rss)
+
+
+# Running vocabulary per text column. New values are appended, so codes
+# handed out for earlier chunks stay valid for the whole extract.
+class CategoryEncoder:
+    def __init__(self):
+        self.categories = {}
+
+    # values (a categorical chunk column) recoded into the running vocabulary
+    def encode(self, values):
+        chunk_categories = values.cat.categories
+        known = self.categories.get(values.name)
+        if known is None:
+            known = chunk_categories
+        else:
+            new = chunk_categories[known.get_indexer(chunk_categories) < 0]
+            if len(new):
+                known = known.append(new)
+        self.categories[values.name] = known
+        lookup = known.get_indexer(chunk_categories)
+        codes = values.array.codes
+        present = codes >= 0
+        recoded = np.full_like(codes, -1)
+        recoded[present] = lookup[codes[present]]
+        return pd.Categorical.from_codes(recoded, categories=known, validate=False)
+
+
+# Columns kept from each chunk: the codes of categorical columns, and every
+# other column as the chunk's own (already parsed) Series
+class ColumnAccumulator:
+    def __init__(self):
+        self.pieces = {}
+        self.nbytes = 0
+
+    def add(self, chunk):
+        for col in chunk.columns:
+            values = chunk[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                piece = values.array.codes
+                self.nbytes += piece.nbytes
+            else:
+                piece = values.reset_index(drop=True)
+                self.nbytes += int(piece.memory_usage(index=False))
+            self.pieces.setdefault(col, []).append(piece)
+
+    # The assembled frame; each column's pieces are released once joined
+    def frame(self, encoder):
+        columns = {}
+        for col in list(self.pieces):
+            pieces = self.pieces.pop(col)
+            if col in encoder.categories:
+                columns[col] = pd.Categorical.from_codes(
+                    np.concatenate(pieces), categories=encoder.categories[col], validate=False)
+            else:
+                columns[col] = pd.concat(pieces, ignore_index=True)
+        return pd.DataFrame(columns, copy=False)
+
+
+# Pipeline stages, each a generator over chunks
+
+def read_chunks(handle, columns, category_columns, chunk_rows):
+    usecols = (lambda c: c in columns) if columns is not None else None
+    dtype = {col: 'category' for col in category_columns}
+    yield from pd.read_csv(handle, usecols=usecols, dtype=dtype, chunksize=chunk_rows)
+
+
+# Each column's date format is settled on its first values and reused, so
+# every chunk is parsed the same way
+def parse_chunk_dates(chunks, date_columns):
+    formats = {}
+    for chunk in chunks:
+        for col in date_columns:
+            if col in chunk.columns:
+                fmt = formats.get(col) or DATE_FORMATS.get(col) or guess_date_format(chunk[col])
+                formats[col] = fmt
+                chunk[col] = parse_dates(chunk[col], fmt)
+        yield chunk
+
+
+def encode_chunks(chunks, encoder, category_columns):
+    for chunk in chunks:
+        for col in category_columns:
+            if col in chunk.columns:
+                chunk[col] = encoder.encode(chunk[col])
+        yield chunk
+
+
+# Stream the CSV at path into a frame of the given columns. Every encoded
+# chunk is passed to each sink's add(chunk) before it is reduced to its kept
+# columns; sinks report their own size as nbytes (see cube.CubeBuilder).
+# on_progress is called with the IngestProgress after every chunk.
+def stream_csv(path, columns=None, date_columns=(), category_columns=(), sinks=(),
+               chunk_rows=INGEST_CHUNK_ROWS, on_progress=log_progress):
+    progress = IngestProgress(path, os.path.getsize(path))
+    encoder = CategoryEncoder()
+    kept = ColumnAccumulator()
+    with open(path, 'rb') as handle:
+        chunks = read_chunks(handle, columns, category_columns, chunk_rows)
+        chunks = parse_chunk_dates(chunks, date_columns)
+        chunks = encode_chunks(chunks, encoder, category_columns)
+        for chunk in chunks:
+            for sink in sinks:
+                sink.add(chunk)
+            kept.add(chunk)
+            progress.update(len(chunk), handle.tell(), kept.nbytes + sum(sink.nbytes for sink in sinks))
+            if on_progress is not None:
+                on_progress(progress)
+    return kept.frame(encoder), progress
@@ -0,0 +1,108 @@
+import numpy as np
+
+from claims.cache import LRUCache
+
+# Financial totals behind the metric cards
+FINANCIAL_COLUMNS = [
+    'total_open_recovery_reserve', 'total_open_remaining_reserve', 'total_open_future_payment',
+    'total_recovery', 'total_net_incurred', 'total_paid'
+]
+
+# KPI definitions behind the metric cards:
+#   claims_monitored     distinct claim numbers under the current filters
+#   potential_leakage    open recovery reserve: recoveries expected on a claim
+#                        but not yet collected
+#   leakage_claims       claims with potential leakage above zero
+#   not_actioned         leakage claims with nothing recovered so far
+#   opportunity_pct      leakage_claims as a share of claims
+#   leakage_rate_pct     potential leakage as a share of net incurred
+# Money metrics are None when the extract lacks the financial columns.
+
+_cache = LRUCache(maxsize=256)
+
+
+# Card values from the raw totals; money metrics stay None when the source
+# has no financial columns
+def summarize(claims_monitored, claims, leakage_claims=None, not_actioned=None,
+              potential_leakage=None, net_incurred=None):
+    metrics = {
+        'claims_monitored': int(claims_monitored),
+        'claims': int(claims),
+        'leakage_claims': None if leakage_claims is None else int(leakage_claims),
+        'not_actioned': None if not_actioned is None else int(not_actioned),
+        'potential_leakage': None if potential_leakage is None else float(potential_leakage),
+        'net_incurred': None if net_incurred is None else float(net_incurred),
+        'opportunity_pct': None,
+        'leakage_rate_pct': None,
+    }
+    if leakage_claims is not None and claims:
+        metrics['opportunity_pct'] = round(100 * leakage_claims / claims, 1)
+    if potential_leakage is not None and net_incurred:
+        metrics['leakage_rate_pct'] = round(100 * potential_leakage / net_incurred, 1)
+    return metrics
+
+
+# All KPIs for the filtered rows from a single pass over the financial block
+def compute_metrics(rows):
+    if not all(col in rows.columns for col in FINANCIAL_COLUMNS):
+        return summarize(rows['claim_number'].nunique(), len(rows))
+
+    block = np.nan_to_num(rows[FINANCIAL_COLUMNS].to_numpy(dtype=np.float64))
+    open_recovery = block[:, FINANCIAL_COLUMNS.index('total_open_recovery_reserve')]
+    recovered = block[:, FINANCIAL_COLUMNS.index('total_recovery')]
+    net_incurred = block[:, FINANCIAL_COLUMNS.index('total_net_incurred')]
+
+    opportunity = open_recovery > 0
+    return summarize(
+        rows['claim_number'].nunique(),
+        len(rows),
+        leakage_claims=opportunity.sum(),
+        not_actioned=(opportunity & (recovered <= 0)).sum(),
+        potential_leakage=open_recovery[opportunity].sum(),
+        net_incurred=net_incurred.sum(),
+    )
+
+
+# KPIs from a data source (ClaimsDataset or SqlSource), memoized per source
+# version and filter state
+def filtered_metrics(source, state):
+    return _cache.get_or_compute((source.version, state.key()), lambda: source.metrics(state))
+
+
+def metrics_cache_stats():
+    return _cache.stats()
+
+
+def format_count(value):
+    return "n/a" if value is None else f"{value:,}"
+
+
+def format_money(value):
+    if value is None:
+        return "n/a"
+    for threshold, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(value) >= threshold:
+            return f"${value / threshold:.1f}{suffix}"
+    return f"${value:,.0f}"
+
+
+def format_pct(value):
+    return "n/a" if value is None else value
+
+
+# Metric cards in display order: key -> (label, formatter). The dashboard and
+# the static reports both label their cards from here.
+METRIC_CARDS = {
+    'claims_monitored': ("Claims Monitored", format_count),
+    'leakage_claims': ("Claims with Leakage Opportunity", format_count),
+    'opportunity_pct': ("Leakage Opportunity %", format_pct),
+    'potential_leakage': ("Potential Leakage $", format_money),
+    'leakage_rate_pct': ("Leakage Rate %", format_pct),
+    'not_actioned': ("Opportunities Not Actioned", format_count),
+}
+
+
+# (label, formatted value) of the card for key
+def metric_card(metrics, key):
+    label, fmt = METRIC_CARDS[key]
+    return label, fmt(metrics[key])
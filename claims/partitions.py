@@ -0,0 +1,299 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from claims.cache import LRUCache
+from claims.catalog import DatasetCatalog, build_catalog, merge_catalogs
+from claims.data import DASHBOARD_COLUMNS, ClaimsDataset, read_claims, source_signature
+from claims.dates import parse_dates
+from claims.filters import FilterState
+
+logger = logging.getLogger(__name__)
+
+# A claims extract split into partition files, e.g. one CSV per
+# claim_received_date month in a directory. Each partition has a small JSON
+# sidecar with its row count and column catalog, so the widgets are
+# populated and date filters are checked without reading the data; only
+# partitions overlapping the selected date ranges are loaded.
+
+PARTITION_SUFFIX = '.partition.json'
+PARTITION_METADATA_VERSION = 2
+# Partition frames kept in memory, bounded by their total size rather than
+# their number, so a selection of many small monthly partitions stays cached
+PARTITION_CACHE_BYTES = int(os.environ.get('CLAIMS_PARTITION_CACHE_MB', '1024')) * 2**20
+# Combinations of partitions served as datasets
+SELECTION_CACHE_SIZE = 2
+# Threads reading partitions; Parquet snapshot reads release the GIL
+READ_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def is_partitioned(location):
+    return os.path.isdir(location) or glob.has_magic(location)
+
+
+# Partition files at location: the CSVs in a directory, or a glob pattern
+def partition_paths(location):
+    pattern = os.path.join(location, '*.csv') if os.path.isdir(location) else location
+    return sorted(glob.glob(pattern))
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + PARTITION_SUFFIX
+
+
+def _metadata_source(signature):
+    return f"v{PARTITION_METADATA_VERSION}:{signature[1]}:{signature[2]}"
+
+
+# Row count, column names and catalog of one partition
+def describe_partition(frame):
+    return {
+        'rows': len(frame),
+        'columns': list(frame.columns),
+        'catalog': build_catalog(frame).to_dict(),
+    }
+
+
+def _frame_bytes(frame):
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+
+class Partition:
+    def __init__(self, path, signature, metadata):
+        self.path = path
+        self.signature = signature
+        self.metadata = metadata
+        self.catalog = DatasetCatalog.from_dict(metadata['catalog'])
+
+    @property
+    def key(self):
+        return self.signature
+
+    # Whether the partition can hold rows inside every date and number range
+    # of state. Rows with no value never pass a range filter, so a partition
+    # without any values in a filtered column is skipped as well.
+    def overlaps(self, state):
+        for col, (start, end) in state.dates.items():
+            if col not in self.catalog:
+                continue
+            bounds = self.catalog.date_bounds(col)
+            if bounds is None:
+                return False
+            if pd.Timestamp(bounds[1]) < pd.Timestamp(start) or pd.Timestamp(bounds[0]) > pd.Timestamp(end):
+                return False
+        for col, (lo, hi) in state.numbers.items():
+            if col not in self.catalog:
+                continue
+            bounds = self.catalog[col].range
+            if bounds is None or bounds[1] < lo or bounds[0] > hi:
+                return False
+        return True
+
+
+# Partition frame for path, read through its Parquet snapshot
+def read_partition(path, signature, columns=DASHBOARD_COLUMNS):
+    return read_claims(path, signature, columns)
+
+
+# Metadata for path from its sidecar, or computed from the partition (which
+# is then returned too, so a first open reads each file only once)
+def open_partition(path, columns=DASHBOARD_COLUMNS):
+    signature = source_signature(path)
+    sidecar = metadata_path(path)
+    try:
+        with open(sidecar) as f:
+            stored = json.load(f)
+        if stored.get('source') == _metadata_source(signature):
+            return Partition(path, signature, stored['metadata']), None
+    except (OSError, ValueError):
+        pass
+
+    frame = read_partition(path, signature, columns)
+    metadata = describe_partition(frame)
+    tmp = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({'source': _metadata_source(signature), 'metadata': metadata}, f)
+        os.replace(tmp, sidecar)
+    except OSError as e:
+        logger.warning("could not write partition metadata %s: %s", sidecar, e)
+    return Partition(path, signature, metadata), frame
+
+
+# Categoricals recoded to one categories dtype: a column blank throughout a
+# partition has empty object categories, which union_categoricals refuses to
+# combine with the string categories of the other partitions
+def _common_categories(values):
+    dtypes = {v.cat.categories.dtype for v in values if len(v.cat.categories)}
+    dtype = dtypes.pop() if len(dtypes) == 1 else object
+    return [
+        v.array if v.cat.categories.dtype == dtype
+        else pd.Categorical.from_codes(v.array.codes, categories=v.cat.categories.astype(dtype), validate=False)
+        for v in values
+    ]
+
+
+# Concatenate partition frames, unifying the categories of text columns
+def concat_partitions(frames):
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for col in frames[0].columns:
+        values = [frame[col] for frame in frames]
+        if all(isinstance(v.dtype, pd.CategoricalDtype) for v in values):
+            columns[col] = pd.Series(union_categoricals(_common_categories(values), ignore_order=True), name=col)
+        else:
+            columns[col] = pd.concat([v.reset_index(drop=True) for v in values], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+# The claims source over a set of partition files. Widgets are served from
+# the partition catalogs, merged once; queries load the partitions overlapping the date
+# filters (in parallel) and are answered by a ClaimsDataset over just those,
+# kept for the next query with the same partitions.
+class PartitionedSource:
+    def __init__(self, location, partitions, frames=None, columns=DASHBOARD_COLUMNS):
+        self.location = location
+        self.partitions = partitions
+        self.columns_loaded = columns
+        self.version = f"{location}@" + ';'.join(f"{os.path.basename(p.path)}:{p.signature[1]}:{p.signature[2]}"
+                                                 for p in partitions)
+        self._frames = LRUCache(maxsize=max(len(partitions), 1), maxbytes=PARTITION_CACHE_BYTES,
+                                sizeof=_frame_bytes)
+        self._datasets = LRUCache(maxsize=SELECTION_CACHE_SIZE)
+        self._catalog = None
+        self._lock = threading.Lock()
+        for partition, frame in zip(partitions, frames or []):
+            if frame is not None:
+                self._frames.get_or_compute(partition.key, lambda: frame)
+
+    @property
+    def empty(self):
+        return not any(p.metadata['rows'] for p in self.partitions)
+
+    @property
+    def columns(self):
+        return self.partitions[0].metadata['columns'] if self.partitions else []
+
+    @property
+    def catalog(self):
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = merge_catalogs([p.catalog for p in self.partitions], self.version)
+            return self._catalog
+
+    # Merge the catalog and load the unfiltered selection up front
+    def warm(self):
+        self.catalog
+        self.dataset(FilterState()).warm()
+        return self
+
+    def options(self, col):
+        return self.catalog.options(col)
+
+    def date_bounds(self, col):
+        return self.catalog.date_bounds(col)
+
+    def _frame(self, partition):
+        return self._frames.get_or_compute(
+            partition.key, lambda: read_partition(partition.path, partition.signature, self.columns_loaded))
+
+    # Dataset over the partitions that can hold rows passing state
+    def dataset(self, state):
+        selected = [p for p in self.partitions if p.overlaps(state) and p.metadata['rows']]
+        key = tuple(p.key for p in selected)
+
+        def load():
+            logger.info("loading %d of %d partitions of %s", len(selected), len(self.partitions), self.location)
+            if not selected:
+                # No rows, but the dtypes of a real partition
+                return ClaimsDataset(self._frame(self.partitions[0]).iloc[:0], self.version)
+            with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(selected))) as pool:
+                frames = list(pool.map(self._frame, selected))
+            return ClaimsDataset(concat_partitions(frames), self.version)
+
+        return self._datasets.get_or_compute(key, load)
+
+    def rows(self, state, limit=None):
+        return self.dataset(state).rows(state, limit)
+
+    def page(self, state, page, page_size, sort_by=None, ascending=True):
+        return self.dataset(state).page(state, page, page_size, sort_by, ascending)
+
+    def count_claims(self, state):
+        return self.dataset(state).count_claims(state)
+
+    def count_by(self, state, col):
+        return self.dataset(state).count_by(state, col)
+
+    def group_counts(self, state, columns, name='count'):
+        return self.dataset(state).group_counts(state, columns, name)
+
+    def count_by_day(self, state, name='claim_count'):
+        return self.dataset(state).count_by_day(state, name)
+
+    def count_by_month(self, state, col):
+        return self.dataset(state).count_by_month(state, col)
+
+    def metrics(self, state):
+        return self.dataset(state).metrics(state)
+
+    def export_callable(self, state, fmt):
+        return self.dataset(state).export_callable(state, fmt)
+
+    def cache_stats(self):
+        return {'partitions': self._frames.stats(), 'datasets': self._datasets.stats()}
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+# One PartitionedSource per location, reopened when the set of partition
+# files or any of their signatures changes. Partitions without metadata are
+# read in parallel to build it.
+def load_partitioned(location, columns=DASHBOARD_COLUMNS):
+    paths = partition_paths(location)
+    signatures = tuple(source_signature(path) for path in paths)
+    with _sources_lock:
+        source, known = _sources.get(location, (None, None))
+    if source is not None and known == signatures:
+        return source
+    if not paths:
+        raise FileNotFoundError(f"No claims partitions found at {location}")
+
+    with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(paths))) as pool:
+        opened = list(pool.map(lambda path: open_partition(path, columns), paths))
+    partitions = [partition for partition, _ in opened]
+    source = PartitionedSource(location, partitions, [frame for _, frame in opened], columns)
+    with _sources_lock:
+        _sources[location] = (source, signatures)
+    return source
+
+
+# Split a single extract into one CSV per claim_received_date month
+def split_by_month(path, out_dir, date_column='claim_received_date'):
+    os.makedirs(out_dir, exist_ok=True)
+    df = pd.read_csv(path, dtype=str)
+    labels = parse_dates(df[date_column]).dt.strftime('%Y-%m').fillna('undated')
+    written = []
+    for label, part in df.groupby(labels.to_numpy(), sort=True):
+        out = os.path.join(out_dir, f"claims_{label}.csv")
+        part.to_csv(out, index=False)
+        written.append(out)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Split a claims extract into monthly partition files")
+    parser.add_argument('csv')
+    parser.add_argument('out_dir')
+    args = parser.parse_args()
+    print(f"wrote {len(split_by_month(args.csv, args.out_dir))} partitions to {args.out_dir}")
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Per-stage timing of dashboard reruns. Off unless CLAIMS_PROFILE is set:
+# '1' records wall time per stage, 'memory' also records peak allocation
+# (tracemalloc, which slows every allocation while it is tracing). Memory
+# mode traces the whole process for as long as it runs, so peak figures
+# include whatever other sessions allocated during a stage.
+PROFILE_MODE = os.environ.get('CLAIMS_PROFILE', '').lower()
+PROFILE_ENABLED = PROFILE_MODE not in ('', '0')
+PROFILE_MEMORY = PROFILE_MODE == 'memory'
+# Reruns per stage kept for the rolling p50/p95
+ROLLING_WINDOW = 200
+
+
+# Rolling stage timings of recent reruns, shared by every session of the process
+class StageHistory:
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self._seconds = {}
+        self._lock = threading.Lock()
+
+    def record(self, app, stage, seconds):
+        with self._lock:
+            history = self._seconds.setdefault((app, stage), deque(maxlen=self.window))
+            history.append(seconds)
+
+    # (p50, p95) in seconds of the recorded runs of stage
+    def percentiles(self, app, stage):
+        with self._lock:
+            history = np.array(self._seconds.get((app, stage), ()))
+        if not len(history):
+            return None, None
+        p50, p95 = np.percentile(history, [50, 95])
+        return float(p50), float(p95)
+
+    def clear(self):
+        with self._lock:
+            self._seconds.clear()
+
+
+_history = StageHistory()
+
+
+def _ensure_handler():
+    # JSON lines go to stderr unless the host has configured logging
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+# Lap timer for one rerun of an app's main(). stage(name) ends the running
+# stage and starts the next, so a stage spans everything up to the following
+# call; finish() ends the last one, records the rerun and logs it. When
+# disabled every call returns immediately.
+class RerunProfile:
+    def __init__(self, app, enabled=None, memory=None):
+        self.app = app
+        self.enabled = PROFILE_ENABLED if enabled is None else enabled
+        self.memory = self.enabled and (PROFILE_MEMORY if memory is None else memory)
+        self.stages = []
+        self._current = None
+        if self.enabled:
+            _ensure_handler()
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._started = time.perf_counter()
+
+    def stage(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._close(now)
+        baseline = None
+        if self.memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        self._current = (name, now, baseline)
+
+    def _close(self, now):
+        if self._current is None:
+            return
+        # Peak allocation is measured above what was allocated when the stage began
+        name, started, baseline = self._current
+        peak = tracemalloc.get_traced_memory()[1] - baseline if self.memory else None
+        self.stages.append({'stage': name, 'seconds': now - started, 'peak_bytes': peak})
+        self._current = None
+
+    # End the rerun: record every stage and emit one JSON log line per stage
+    # plus one for the whole rerun
+    def finish(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._close(now)
+        stages = self.stages + [{'stage': 'total', 'seconds': now - self._started, 'peak_bytes': None}]
+        for entry in stages:
+            _history.record(self.app, entry['stage'], entry['seconds'])
+            p50, p95 = _history.percentiles(self.app, entry['stage'])
+            record = {
+                'event': 'stage_timing',
+                'app': self.app,
+                'stage': entry['stage'],
+                'ms': round(entry['seconds'] * 1000, 3),
+                'p50_ms': round(p50 * 1000, 3),
+                'p95_ms': round(p95 * 1000, 3),
+            }
+            if entry['peak_bytes'] is not None:
+                record['peak_bytes'] = entry['peak_bytes']
+            logger.info(json.dumps(record))
+        self.stages = stages
+
+    # Table of the finished rerun for the debug panel
+    def summary(self):
+        rows = []
+        for entry in self.stages:
+            p50, p95 = _history.percentiles(self.app, entry['stage'])
+            row = {
+                'stage': entry['stage'],
+                'ms': entry['seconds'] * 1000,
+                'p50 ms': p50 * 1000 if p50 is not None else None,
+                'p95 ms': p95 * 1000 if p95 is not None else None,
+            }
+            if self.memory:
+                peak = entry['peak_bytes']
+                row['peak MB'] = peak / 2**20 if peak is not None else None
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def clear_history():
+    _history.clear()
+
+
+# Profile for one rerun of app. A session can opt in to stage timings
+# without the environment variable by passing requested, e.g. from a
+# ?profile=1 URL parameter. Memory mode slows every session of the process,
+# so only the operator can turn it on, through CLAIMS_PROFILE=memory.
+def rerun_profile(app, requested=None):
+    enabled = PROFILE_ENABLED or str(requested or '').lower() not in ('', '0')
+    return RerunProfile(app, enabled=enabled, memory=PROFILE_MEMORY)
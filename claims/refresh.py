@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+
+from claims.sources import SourceError, open_source, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of a source for a new version. 0 turns background
+# refresh off, and a changed source is then reloaded by the first rerun
+# that sees it.
+REFRESH_INTERVAL = float(os.environ.get('CLAIMS_REFRESH_INTERVAL', '10'))
+
+
+# Keeps the current version of one source loaded. A daemon thread checks the
+# source's file stats every interval; once they have changed and then held
+# still for another interval (so a file still being written is not read),
+# it opens the new version, builds its index, cube and catalog, and only
+# then swaps it in. A rerun takes whichever version is current when it
+# starts and keeps it to the end, so sessions in flight finish on the old
+# version and no rerun waits for a reload.
+class SourceRefresher:
+    def __init__(self, location, interval=REFRESH_INTERVAL):
+        self.location = location
+        self.interval = interval
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_refresh_seconds = None
+        self.refreshed_at = time.time()
+        self._fingerprint = source_fingerprint(location)
+        self._source = open_source(location).warm()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"claims-refresh {location}", daemon=True)
+        self._thread.start()
+
+    # The current version; replaced by a single reference assignment
+    @property
+    def source(self):
+        return self._source
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            try:
+                fingerprint = source_fingerprint(self.location)
+            except SourceError as e:
+                # e.g. the file is being replaced; try again next interval
+                logger.debug("%s", e)
+                continue
+            if fingerprint == self._fingerprint:
+                pending = None
+            elif fingerprint != pending:
+                pending = fingerprint
+            else:
+                self.refresh(fingerprint)
+                pending = None
+
+    # Load, warm and swap in the version at location now. On failure the
+    # current version stays in place and the next change is tried again.
+    def refresh(self, fingerprint=None):
+        started = time.perf_counter()
+        try:
+            fingerprint = fingerprint or source_fingerprint(self.location)
+            source = open_source(self.location).warm()
+        except SourceError as e:
+            return self._failed(fingerprint, e)
+        except Exception as e:  # the refresher thread must outlive a bad extract
+            logger.exception("unexpected error refreshing %s", self.location)
+            return self._failed(fingerprint, e)
+        previous, self._source, self._fingerprint = self._source, source, fingerprint
+        self.refreshes += 1
+        self.refreshed_at = time.time()
+        self.last_refresh_seconds = time.perf_counter() - started
+        logger.info("refreshed %s in %.1fs: %s -> %s", self.location, self.last_refresh_seconds,
+                    previous.version, source.version)
+        return True
+
+    def _failed(self, fingerprint, error):
+        self.failures += 1
+        self.last_error = str(error)
+        self._fingerprint = fingerprint
+        logger.warning("refresh of %s failed, still serving %s: %s", self.location, self._source.version, error)
+        return False
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'location': self.location,
+            'version': self._source.version,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'refreshed_at': self.refreshed_at,
+            'last_refresh_seconds': self.last_refresh_seconds,
+        }
+
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+# The current version of the source at location. With background refresh
+# on, the first call loads it and starts its refresher; every later call
+# returns at once with whatever version is current.
+def current_source(location):
+    if REFRESH_INTERVAL <= 0:
+        return open_source(location)
+    with _refreshers_lock:
+        refresher = _refreshers.get(location)
+        if refresher is None:
+            refresher = _refreshers[location] = SourceRefresher(location)
+    return refresher.source
+
+
+def refresh_stats(location):
+    with _refreshers_lock:
+        refresher = _refreshers.get(location)
+    return refresher.stats() if refresher is not None else None
@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io
+import plotly.offline
+
+from claims.charts import (
+    city_bar, claims_over_time_line, line_of_business_bar, owner_bar, status_bar, status_pie, trend_monthly,
+)
+from claims.data import CLAIMS_CSV
+from claims.filters import FilterState
+from claims.metrics import METRIC_CARDS
+from claims.sources import open_source
+
+# Static dashboard snapshots, one per combination of filter values, rendered
+# without Streamlit:
+#
+#   python -m claims.report --out reports
+#   python -m claims.report sqlite:///claims.db --by line_of_business source_system claim_status
+#
+# Combinations are rendered by a process pool. Each worker opens the source
+# once; a CSV source is served from its memory-mapped store, so all workers
+# share one loaded copy of the data.
+
+REPORT_BY = ['line_of_business', 'source_system']
+REPORT_FORMATS = ['html', 'json']
+
+CHARTS = {
+    'status': status_bar,
+    'claims_over_time': claims_over_time_line,
+    'status_distribution': status_pie,
+    'line_of_business': line_of_business_bar,
+    'trend_monthly': trend_monthly,
+    'city': city_bar,
+    'owner': owner_bar,
+}
+# Summary tables: name -> (column, rows shown)
+TABLES = {
+    'Claims by Status': ('claim_status', None),
+    'Claims by Nature of Loss': ('general_nature_of_loss', None),
+    'Claims by Fault Rating': ('fault_rating', None),
+    'Top Loss Locations': ('loss_location_city', 10),
+}
+
+_source = None
+
+
+def _init_worker(location):
+    global _source
+    _source = open_source(location)
+
+
+# Value combinations of the by columns that have claims, with their counts
+def combinations(source, by):
+    counts = source.group_counts(FilterState(), by, 'claims')
+    return [(tuple(row[:-1]), int(row[-1])) for row in counts.itertuples(index=False) if row[-1]]
+
+
+# File name of a combination: a readable slug of its values plus a short hash
+# of the values themselves, since different values can share a slug
+# ('Motor/Fleet' and 'Motor Fleet')
+def report_name(values):
+    slug = '__'.join(re.sub(r'[^A-Za-z0-9]+', '-', str(v)).strip('-').lower() or 'blank' for v in values)
+    digest = hashlib.sha256(json.dumps([str(v) for v in values]).encode()).hexdigest()[:8]
+    return f"{slug}__{digest}"
+
+
+# Metrics, summary tables and figures of one filter combination
+def build_report(source, state):
+    tables = {}
+    for title, (col, limit) in TABLES.items():
+        counts = source.count_by(state, col)
+        tables[title] = counts.head(limit) if limit else counts
+    return {
+        'metrics': source.metrics(state),
+        'tables': tables,
+        'figures': {name: chart(source, state) for name, chart in CHARTS.items()},
+    }
+
+
+def render_html(title, report):
+    cards = ''.join(
+        f"<div class='card'><h3>{label}</h3><div class='value'>{fmt(report['metrics'][key])}</div></div>"
+        for key, (label, fmt) in METRIC_CARDS.items()
+    )
+    tables = ''.join(
+        f"<h2>{html.escape(name)}</h2>{table.to_html(index=False, border=0, classes='summary')}"
+        for name, table in report['tables'].items()
+    )
+    figures = ''.join(
+        plotly.io.to_html(fig, full_html=False, include_plotlyjs=False) for fig in report['figures'].values()
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<script src="plotly.min.js"></script>
+<style>
+body {{ font-family: sans-serif; background: #f0f0f0; margin: 2em; }}
+h1, h2, h3 {{ color: #5d3a9b; }}
+.cards {{ display: flex; flex-wrap: wrap; }}
+.card {{ border: 2px solid #5d3a9b; border-radius: 8px; background: #fff; padding: 16px; margin: 8px; width: 160px; }}
+.card h3 {{ font-size: 15px; margin: 0 0 8px; }}
+.card .value {{ font-size: 28px; font-weight: bold; color: #333; }}
+table.summary {{ border-collapse: collapse; background: #fff; }}
+table.summary th {{ background: #5d3a9b; color: #fff; padding: 4px 12px; }}
+table.summary td {{ padding: 4px 12px; }}
+table.summary tr:nth-child(even) {{ background: #f2f2f2; }}
+</style></head>
+<body><h1>{html.escape(title)}</h1>
+<div class="cards">{cards}</div>
+{tables}
+{figures}
+</body></html>
+"""
+
+
+def render_json(title, filters, report):
+    return json.dumps({
+        'title': title,
+        'filters': filters,
+        'metrics': report['metrics'],
+        'tables': {name: table.to_dict(orient='records') for name, table in report['tables'].items()},
+        'figures': {name: json.loads(plotly.io.to_json(fig, validate=False))
+                    for name, fig in report['figures'].items()},
+    }, default=str)
+
+
+# Render one combination into out_dir; runs in a worker process
+def render_combination(by, values, out_dir, formats):
+    started = time.perf_counter()
+    filters = {col: value for col, value in zip(by, values)}
+    state = FilterState(text={col: [value] for col, value in filters.items()})
+    title = "Claims Report: " + ", ".join(f"{col} = {value}" for col, value in filters.items())
+    report = build_report(_source, state)
+    name = report_name(values)
+    if 'html' in formats:
+        with open(os.path.join(out_dir, f"{name}.html"), 'w', encoding='utf-8') as f:
+            f.write(render_html(title, report))
+    if 'json' in formats:
+        with open(os.path.join(out_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            f.write(render_json(title, filters, report))
+    return name, time.perf_counter() - started
+
+
+def write_index(out_dir, by, rendered, formats):
+    rows = ''.join(
+        f"<tr>{''.join(f'<td>{html.escape(str(v))}</td>' for v in values)}<td>{claims:,}</td>"
+        f"<td>{' '.join(f'<a href={name}.{fmt}>{fmt}</a>' for fmt in formats)}</td></tr>"
+        for values, claims, name in rendered
+    )
+    header = ''.join(f"<th>{html.escape(col)}</th>" for col in by)
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Claims Reports</title></head>"
+                f"<body><h1>Claims Reports</h1><table><tr>{header}<th>claims</th><th>report</th></tr>{rows}"
+                f"</table></body></html>\n")
+
+
+# Render every combination of the by columns into out_dir and return run
+# statistics, including throughput
+def render_reports(location, out_dir, by=REPORT_BY, formats=REPORT_FORMATS, workers=None):
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    if 'html' in formats:
+        with open(os.path.join(out_dir, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+            f.write(plotly.offline.get_plotlyjs())
+
+    # Loaded (and its shared store built) once here, before the workers start
+    _init_worker(location)
+    combos = combinations(_source, by)
+    loaded = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(location,)) as pool:
+        futures = [pool.submit(render_combination, by, values, out_dir, formats) for values, _ in combos]
+        results = [future.result() for future in futures]
+    finished = time.perf_counter()
+
+    write_index(out_dir, by, [(values, claims, name) for (values, claims), (name, _) in zip(combos, results)],
+                formats)
+    render_seconds = finished - loaded
+    stats = {
+        'source': location,
+        'version': _source.version,
+        'by': by,
+        'reports': len(results),
+        'workers': workers or os.cpu_count(),
+        'load_seconds': loaded - started,
+        'render_seconds': render_seconds,
+        'reports_per_second': len(results) / render_seconds if render_seconds else None,
+        'slowest_report_seconds': max((seconds for _, seconds in results), default=None),
+    }
+    with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render static claims reports for every filter combination")
+    parser.add_argument('source', nargs='?', default=os.environ.get('CLAIMS_SOURCE', CLAIMS_CSV),
+                        help="CSV path or database URL (default: CLAIMS_SOURCE or Claims.csv)")
+    parser.add_argument('--out', default='reports', help="output directory")
+    parser.add_argument('--by', nargs='+', default=REPORT_BY, help="columns whose value combinations are reported")
+    parser.add_argument('--format', nargs='+', choices=REPORT_FORMATS, default=REPORT_FORMATS, dest='formats')
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    stats = render_reports(args.source, args.out, args.by, args.formats, args.workers)
+    print(f"rendered {stats['reports']} reports in {stats['render_seconds']:.1f}s "
+          f"({stats['reports_per_second']:.1f}/s, {stats['workers']} workers; load {stats['load_seconds']:.1f}s)")
@@ -0,0 +1,48 @@
+from claims.data import CLAIMS_CSV, load_dataset, source_signature
+from claims.partitions import is_partitioned, load_partitioned, partition_paths
+from claims.sql import DATABASE_ERRORS, is_database_url, parse_url, sql_source
+
+# All kinds of source answer the dashboards through the same interface:
+#   empty, version, columns
+#   catalog (a claims.catalog.DatasetCatalog), options(col), date_bounds(col)
+#   rows(state, limit), page(state, page, page_size, sort_by, ascending)
+#   count_claims(state)
+#   count_by(state, col), group_counts(state, columns, name)
+#   count_by_day(state, name), count_by_month(state, col)
+#   metrics(state), export_callable(state, fmt)
+#   warm() to build derived structures ahead of the first query
+# where state is a claims.filters.FilterState.
+
+
+# The claims source at a location could not be opened or read
+class SourceError(Exception):
+    pass
+
+
+# Open the claims source at location: a database URL such as
+# sqlite:///claims.db or duckdb:///claims.duckdb, a directory or glob of
+# partition CSVs, or a single CSV path loaded into memory (streamed in
+# chunks when it is large). Missing files, unreadable CSVs and database
+# errors are raised as SourceError.
+def open_source(location=CLAIMS_CSV):
+    try:
+        if is_database_url(location):
+            return sql_source(location)
+        if is_partitioned(location):
+            return load_partitioned(location)
+        return load_dataset(location)
+    except (OSError, ValueError, ImportError) + DATABASE_ERRORS as e:
+        raise SourceError(f"Could not load claims from {location}: {e}") from e
+
+
+# Cheap identity of the data at location, from file stats only; it changes
+# whenever open_source would load a new version
+def source_fingerprint(location=CLAIMS_CSV):
+    try:
+        if is_database_url(location):
+            return source_signature(parse_url(location)[1])
+        if is_partitioned(location):
+            return tuple(source_signature(path) for path in partition_paths(location))
+        return source_signature(location)
+    except (OSError, ValueError, ImportError) as e:
+        raise SourceError(f"Could not check claims at {location}: {e}") from e
@@ -0,0 +1,474 @@
+import argparse
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from claims.cache import LRUCache
+from claims.catalog import (
+    HISTOGRAM_BINS, MAX_CATALOG_VALUES, ColumnSummary, DatasetCatalog, date_summary, epoch_days, text_summary,
+)
+from claims.categories import CATEGORY_COLUMNS
+from claims.data import DASHBOARD_COLUMNS, DATE_COLUMNS
+from claims.dates import parse_dates
+from claims.export import EXPORT_CHUNK_ROWS, deferred_export
+from claims.filters import normalize_claim_number
+from claims.ingest import parse_chunk_dates
+from claims.metrics import FINANCIAL_COLUMNS, summarize
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional; SQLite ships with Python
+    duckdb = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Parquet export is offered only when pyarrow is installed
+    pa = None
+
+# Errors raised by the database drivers
+DATABASE_ERRORS = (sqlite3.Error,) + ((duckdb.Error,) if duckdb is not None else ())
+
+# Default table holding the claims extract
+CLAIMS_TABLE = 'claims'
+# Idle connections kept per source between reruns
+POOL_SIZE = 4
+# Columns indexed when importing into SQLite
+INDEXED_COLUMNS = [
+    'claim_number', 'source_system', 'general_nature_of_loss', 'line_of_business', 'claim_status',
+    'fault_rating', 'fault_categorisation', 'claim_received_date'
+] + FINANCIAL_COLUMNS
+
+
+# SQL differences between the supported engines
+class SqliteDialect:
+    scheme = 'sqlite'
+
+    @staticmethod
+    def connect(path):
+        # Pooled connections move between Streamlit's script threads
+        return sqlite3.connect(path, check_same_thread=False)
+
+    @staticmethod
+    def day(col):
+        return f"date({col})"
+
+    @staticmethod
+    def month(col):
+        return f"strftime('%Y-%m', {col})"
+
+    @staticmethod
+    def text(col):
+        return f"CAST({col} AS TEXT)"
+
+    # NULL unless the value is all digits: CAST alone reads the leading
+    # digits of any text, so '2023-0001' would be 2023
+    @staticmethod
+    def integer(col):
+        digits = f"TRIM(CAST({col} AS TEXT))"
+        return f"CASE WHEN {digits} GLOB '[0-9]*' AND {digits} NOT GLOB '*[^0-9]*' THEN CAST({digits} AS INTEGER) END"
+
+    # Only applied to non-negative values, which CAST truncates downwards
+    @staticmethod
+    def floor(expr):
+        return f"CAST({expr} AS INTEGER)"
+
+    @staticmethod
+    def date_param(value):
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+    # Declared type of every column of table
+    @staticmethod
+    def column_types(conn, table):
+        return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+class DuckdbDialect:
+    scheme = 'duckdb'
+
+    @staticmethod
+    def connect(path):
+        return duckdb.connect(path, read_only=True)
+
+    @staticmethod
+    def day(col):
+        return f"CAST({col} AS DATE)"
+
+    @staticmethod
+    def month(col):
+        return f"strftime(CAST({col} AS DATE), '%Y-%m')"
+
+    @staticmethod
+    def text(col):
+        return f"CAST({col} AS VARCHAR)"
+
+    @staticmethod
+    def integer(col):
+        return f"TRY_CAST({col} AS BIGINT)"
+
+    @staticmethod
+    def floor(expr):
+        return f"CAST(FLOOR({expr}) AS BIGINT)"
+
+    @staticmethod
+    def date_param(value):
+        return pd.Timestamp(value).date()
+
+    @staticmethod
+    def column_types(conn, table):
+        rows = conn.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = ?"
+                            " ORDER BY ordinal_position", [table]).fetchall()
+        return dict(rows)
+
+
+DIALECTS = {'sqlite': SqliteDialect, 'duckdb': DuckdbDialect}
+
+
+def is_database_url(location):
+    scheme, separator, _ = location.partition(':///')
+    return bool(separator) and scheme in DIALECTS
+
+
+# Split 'sqlite:///claims.db' into (dialect, path)
+def parse_url(url):
+    scheme, _, path = url.partition(':///')
+    if scheme not in DIALECTS or not path:
+        raise ValueError(f"Unsupported claims database URL: {url}")
+    if scheme == 'duckdb' and duckdb is None:
+        raise ImportError("duckdb is not installed")
+    return DIALECTS[scheme], path
+
+
+# Connections reused across reruns and sessions. Any number can be checked
+# out at once; up to size idle ones are kept for the next caller.
+class ConnectionPool:
+    def __init__(self, connect, size=POOL_SIZE):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+
+# Arrow type of a column from its declared SQL type. Date columns are
+# decoded to timestamps, as they are on load from a CSV.
+def arrow_type(col, declared):
+    declared = (declared or '').upper()
+    if col in DATE_COLUMNS or declared.startswith(('DATE', 'TIMESTAMP')):
+        return pa.timestamp('us')
+    if 'INT' in declared:
+        return pa.int64()
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB', 'DECIMAL', 'NUMERIC')):
+        return pa.float64()
+    if declared.startswith('BOOL'):
+        return pa.bool_()
+    return pa.string()
+
+
+# Parameterized WHERE clause equivalent to FilterIndex.mask(state)
+def build_where(state, dialect):
+    clauses, params = [], []
+    if state.has_claim_filter:
+        claim_number = f"UPPER(TRIM({dialect.text('claim_number')}))"
+        matches = []
+        if state.claim_numbers:
+            matches.append(f"{claim_number} IN ({', '.join('?' * len(state.claim_numbers))})")
+            params.extend(normalize_claim_number(n) for n in state.claim_numbers)
+        for prefix in state.claim_prefixes:
+            matches.append(f"{claim_number} LIKE ? ESCAPE '\\'")
+            params.append(re.sub(r'([%_\\])', r'\\\1', normalize_claim_number(prefix)) + '%')
+        for lo, hi in state.claim_ranges:
+            matches.append(f"{dialect.integer('claim_number')} BETWEEN ? AND ?")
+            params.extend([int(lo), int(hi)])
+        clauses.append(f"({' OR '.join(matches)})")
+    for col, selected in state.text.items():
+        selected = [str(value) for value in selected]
+        clauses.append(f"{col} IN ({', '.join('?' * len(selected))})" if selected else "1 = 0")
+        params.extend(selected)
+    for col, (start, end) in state.dates.items():
+        clauses.append(f"{dialect.day(col)} BETWEEN ? AND ?")
+        params.extend([dialect.date_param(start), dialect.date_param(end)])
+    for col, (lo, hi) in state.numbers.items():
+        clauses.append(f"{col} BETWEEN ? AND ?")
+        params.extend([float(lo), float(hi)])
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+# Claims table in a SQLite or DuckDB file. Filters are pushed down as a
+# WHERE clause and chart data as GROUP BY queries, so only aggregates (and
+# the table/export rows) are pulled into pandas. Implements the same query
+# interface as claims.data.ClaimsDataset.
+class SqlSource:
+    def __init__(self, url, table=CLAIMS_TABLE):
+        self.url = url
+        self.table = table
+        self.dialect, self.path = parse_url(url)
+        self.pool = ConnectionPool(lambda: self.dialect.connect(self.path))
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"SELECT * FROM {table} LIMIT 0")
+            self.columns = [d[0] for d in cursor.description]
+        self._catalogs = LRUCache(maxsize=1)
+
+    # Changes whenever the database file is rewritten, for memo keys
+    @property
+    def version(self):
+        stat = os.stat(self.path)
+        return f"{self.url}@{stat.st_mtime_ns}:{stat.st_size}"
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+    @property
+    def empty(self):
+        return self.query(f"SELECT 1 FROM {self.table} LIMIT 1").empty
+
+    # Column catalog of the dashboard columns, built with a few aggregate
+    # queries per column once per database version
+    @property
+    def catalog(self):
+        version = self.version
+        return self._catalogs.get_or_compute(version, lambda: DatasetCatalog(
+            version, [self._summarize(col) for col in DASHBOARD_COLUMNS if col in self.columns]))
+
+    # The catalog is the only structure kept per database version
+    def warm(self):
+        self.catalog
+        return self
+
+    def _summarize(self, col):
+        table = self.table
+        nulls = int(self.query(f"SELECT COUNT(*) AS n FROM {table} WHERE {col} IS NULL")['n'][0])
+        if col in DATE_COLUMNS:
+            day = self.dialect.day(col)
+            days = self.query(f"SELECT {day} AS day, COUNT(*) AS count FROM {table}"
+                              f" WHERE {col} IS NOT NULL GROUP BY {day}")
+            stamps = pd.to_datetime(days['day'], errors='coerce').to_numpy()
+            valid = ~pd.isnull(stamps)
+            # Values that are not dates count as missing, as they do on load
+            nulls += int(days['count'][~valid].sum())
+            return date_summary(col, pd.Series(days['count'].to_numpy()[valid], index=epoch_days(stamps[valid])),
+                                nulls)
+
+        stats = self.query(f"SELECT COUNT(*) AS n, COUNT(DISTINCT {col}) AS distinct_values, MIN({col}) AS lo,"
+                           f" MAX({col}) AS hi FROM {table}").iloc[0]
+        rows, distinct = int(stats['n']), int(stats['distinct_values'])
+        lo, hi = (v.item() if isinstance(v, np.generic) else v for v in (stats['lo'], stats['hi']))
+        if col in CATEGORY_COLUMNS or not isinstance(lo, (int, float)):
+            if distinct > MAX_CATALOG_VALUES:
+                return ColumnSummary(col, 'text', rows, nulls, distinct)
+            counts = self.query(f"SELECT {col} AS value, COUNT(*) AS count FROM {table}"
+                                f" WHERE {col} IS NOT NULL GROUP BY {col}")
+            return text_summary(col, pd.Series(counts['count'].to_numpy(), index=counts['value']), nulls)
+
+        width = (hi - lo) / HISTOGRAM_BINS if hi > lo else 1 / HISTOGRAM_BINS
+        bucket = self.dialect.floor(f"({col} - ?) / ?")
+        bins = self.query(f"SELECT {bucket} AS bin, COUNT(*) AS count FROM {table}"
+                          f" WHERE {col} IS NOT NULL GROUP BY bin", (lo, width))
+        counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        np.add.at(counts, np.clip(bins['bin'].to_numpy(dtype=np.int64), 0, HISTOGRAM_BINS - 1), bins['count'])
+        edges = lo + width * np.arange(HISTOGRAM_BINS + 1)
+        return ColumnSummary(col, 'number', rows, nulls, distinct, min=lo, max=hi, histogram=(counts, edges))
+
+    def options(self, col):
+        return self.catalog.options(col)
+
+    def date_bounds(self, col):
+        return self.catalog.date_bounds(col)
+
+    def rows(self, state, limit=None):
+        where, params = build_where(state, self.dialect)
+        sql = f"SELECT * FROM {self.table}{where}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._decode(self.query(sql, params))
+
+    def page(self, state, page, page_size, sort_by=None, ascending=True):
+        where, params = build_where(state, self.dialect)
+        total = int(self.query(f"SELECT COUNT(*) AS n FROM {self.table}{where}", params)['n'][0])
+        order = ''
+        if sort_by is not None:
+            if sort_by not in self.columns:
+                raise ValueError(f"Unknown sort column: {sort_by}")
+            order = f" ORDER BY {sort_by} IS NULL, {sort_by} {'ASC' if ascending else 'DESC'}"
+        sql = f"SELECT * FROM {self.table}{where}{order} LIMIT {int(page_size)} OFFSET {int(page) * int(page_size)}"
+        return self._decode(self.query(sql, params)), total
+
+    def count_claims(self, state):
+        where, params = build_where(state, self.dialect)
+        return int(self.query(f"SELECT COUNT(DISTINCT claim_number) AS n FROM {self.table}{where}", params)['n'][0])
+
+    def count_by(self, state, col):
+        where, params = build_where(state, self.dialect)
+        not_null = f"{' AND' if where else ' WHERE'} {col} IS NOT NULL"
+        return self.query(
+            f"SELECT {col}, COUNT(*) AS count FROM {self.table}{where}{not_null}"
+            f" GROUP BY {col} ORDER BY count DESC",
+            params,
+        )
+
+    def group_counts(self, state, columns, name='count'):
+        where, params = build_where(state, self.dialect)
+        keys = ', '.join(columns)
+        not_null = ' AND '.join(f"{col} IS NOT NULL" for col in columns)
+        not_null = f"{' AND' if where else ' WHERE'} {not_null}"
+        return self._decode(self.query(
+            f"SELECT {keys}, COUNT(*) AS {name} FROM {self.table}{where}{not_null}"
+            f" GROUP BY {keys} ORDER BY {keys}",
+            params,
+        ))
+
+    def count_by_day(self, state, name='claim_count'):
+        where, params = build_where(state, self.dialect)
+        day = self.dialect.day('claim_received_date')
+        counts = self.query(
+            f"SELECT {day} AS claim_received_date, COUNT(*) AS {name} FROM {self.table}{where}"
+            f"{' AND' if where else ' WHERE'} claim_received_date IS NOT NULL"
+            f" GROUP BY {day} ORDER BY {day}",
+            params,
+        )
+        counts['claim_received_date'] = pd.to_datetime(counts['claim_received_date'])
+        return counts
+
+    def count_by_month(self, state, col):
+        where, params = build_where(state, self.dialect)
+        month = self.dialect.month('claim_received_date')
+        return self.query(
+            f"SELECT {month} AS month_year, {col}, COUNT(*) AS count FROM {self.table}{where}"
+            f"{' AND' if where else ' WHERE'} claim_received_date IS NOT NULL AND {col} IS NOT NULL"
+            f" GROUP BY {month}, {col} ORDER BY {month}, {col}",
+            params,
+        )
+
+    def metrics(self, state):
+        where, params = build_where(state, self.dialect)
+        if not all(col in self.columns for col in FINANCIAL_COLUMNS):
+            result = self.query(
+                f"SELECT COUNT(DISTINCT claim_number) AS monitored, COUNT(*) AS claims FROM {self.table}{where}",
+                params,
+            )
+            return summarize(result['monitored'][0], result['claims'][0])
+
+        open_recovery = "COALESCE(total_open_recovery_reserve, 0)"
+        result = self.query(
+            f"SELECT COUNT(DISTINCT claim_number) AS monitored, COUNT(*) AS claims,"
+            f" SUM(CASE WHEN {open_recovery} > 0 THEN 1 ELSE 0 END) AS leakage_claims,"
+            f" SUM(CASE WHEN {open_recovery} > 0 AND COALESCE(total_recovery, 0) <= 0 THEN 1 ELSE 0 END)"
+            f" AS not_actioned,"
+            f" SUM(CASE WHEN {open_recovery} > 0 THEN {open_recovery} ELSE 0 END) AS potential_leakage,"
+            f" SUM(COALESCE(total_net_incurred, 0)) AS net_incurred"
+            f" FROM {self.table}{where}",
+            params,
+        ).fillna(0).iloc[0]
+        return summarize(
+            result['monitored'], result['claims'],
+            leakage_claims=result['leakage_claims'],
+            not_actioned=result['not_actioned'],
+            potential_leakage=result['potential_leakage'],
+            net_incurred=result['net_incurred'],
+        )
+
+    # Chunks are typed by what they hold, so a Parquet export is written
+    # with one schema taken from the table's declared column types; dates are
+    # parsed with one format per column across all chunks
+    def export_callable(self, state, fmt):
+        where, params = build_where(state, self.dialect)
+
+        def records():
+            with self.pool.connection() as conn:
+                cursor = conn.execute(f"SELECT * FROM {self.table}{where}", params)
+                columns = [d[0] for d in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+
+        def chunks():
+            return parse_chunk_dates(records(), [col for col in DATE_COLUMNS if col in self.columns])
+
+        return deferred_export(chunks, fmt, self.export_schema() if fmt == 'Parquet' else None)
+
+    def export_schema(self):
+        if pa is None:
+            return None
+        with self.pool.connection() as conn:
+            declared = self.dialect.column_types(conn, self.table)
+        return pa.schema([(col, arrow_type(col, declared.get(col))) for col in self.columns])
+
+    # Date columns come back from SQLite as text
+    def _decode(self, frame):
+        for col in DATE_COLUMNS:
+            if col in frame.columns:
+                frame[col] = parse_dates(frame[col])
+        return frame
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+# One SqlSource (and connection pool) per URL for the life of the process
+def sql_source(url, table=CLAIMS_TABLE):
+    with _sources_lock:
+        if (url, table) not in _sources:
+            _sources[(url, table)] = SqlSource(url, table)
+        return _sources[(url, table)]
+
+
+# Load a claims CSV into a table of a SQLite or DuckDB file, with dates
+# parsed and the filter columns indexed
+def import_csv(csv_path, url, table=CLAIMS_TABLE, chunk_rows=200_000):
+    dialect, path = parse_url(url)
+    if dialect is DuckdbDialect:
+        conn = duckdb.connect(path)
+        try:
+            conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM read_csv_auto(?)", [csv_path])
+        finally:
+            conn.close()
+        return
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            for col in DATE_COLUMNS:
+                if col in chunk.columns:
+                    chunk[col] = parse_dates(chunk[col]).dt.strftime('%Y-%m-%d')
+            chunk.to_sql(table, conn, if_exists='append', index=False)
+        columns = pd.read_sql_query(f"SELECT * FROM {table} LIMIT 0", conn).columns
+        for col in INDEXED_COLUMNS:
+            if col in columns:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{col} ON {table} ({col})")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load a claims CSV into a SQLite or DuckDB table")
+    parser.add_argument('csv', help="claims extract, e.g. Claims.csv")
+    parser.add_argument('url', help="target database, e.g. sqlite:///claims.db or duckdb:///claims.duckdb")
+    parser.add_argument('--table', default=CLAIMS_TABLE)
+    args = parser.parse_args()
+    import_csv(args.csv, args.url, args.table)
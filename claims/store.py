@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # without pyarrow datasets simply stay on the heap
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Memory-mapped Arrow IPC file written next to the CSV
+STORE_SUFFIX = '.store.arrow'
+# Schema metadata: which source/columns the store holds and how to rebuild
+# each column from its stored values
+STORE_SOURCE_KEY = b'claims_source'
+STORE_LAYOUT_KEY = b'claims_layout'
+
+
+# Store holding the loaded claims frame in a layout that maps straight back
+# into numpy: categoricals as their integer codes (categories kept in the
+# metadata), dates as int64 ticks with NaT as its int64 sentinel and numbers
+# with NaN in place of nulls. Anything else is stored as plain Arrow.
+#
+# Every session, and every process on the host, maps the same file, so the
+# dataset lives once in the OS page cache. The frame returned by open_store
+# is made of read-only views into the map and is never copied per session.
+def write_store(frame, path, source):
+    arrays, layout = {}, {}
+    for col in frame.columns:
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays[col] = pa.array(values.array.codes)
+            layout[col] = {'kind': 'category', 'categories': values.cat.categories.tolist()}
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            ticks = values.to_numpy()
+            arrays[col] = pa.array(ticks.view(np.int64))
+            layout[col] = {'kind': 'datetime', 'dtype': str(ticks.dtype)}
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+            arrays[col] = pa.array(values.to_numpy(), from_pandas=False)
+            layout[col] = {'kind': 'numeric'}
+        else:
+            arrays[col] = pa.array(values, from_pandas=True)
+            layout[col] = {'kind': 'arrow'}
+
+    table = pa.table(arrays).replace_schema_metadata({
+        STORE_SOURCE_KEY: source,
+        STORE_LAYOUT_KEY: json.dumps(layout).encode(),
+    })
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        logger.warning("could not write shared store %s: %s", path, e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+# Zero-copy numpy view of a mapped column
+def _view(column):
+    chunk = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return chunk.to_numpy(zero_copy_only=True)
+
+
+# Frame of read-only views into the store at path, or None if it is missing
+# or was built from a different source
+def open_store(path, source):
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(STORE_SOURCE_KEY) != source:
+        return None
+
+    layout = json.loads(metadata[STORE_LAYOUT_KEY])
+    columns = {}
+    for col in table.column_names:
+        kind = layout[col]['kind']
+        if kind == 'category':
+            categories = pd.Index(layout[col]['categories'])
+            columns[col] = pd.Categorical.from_codes(_view(table.column(col)), categories=categories, validate=False)
+        elif kind == 'datetime':
+            columns[col] = _view(table.column(col)).view(layout[col]['dtype'])
+        elif kind == 'numeric':
+            columns[col] = _view(table.column(col))
+        else:
+            columns[col] = table.column(col).to_pandas()
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+# Server-side paging of the claims table: only the rows of the visible page
+# are materialized, styled and sent to the browser
+PAGE_SIZES = [20, 50, 100, 500]
+ROW_STYLES = ('background-color: #f9f9f9', 'background-color: #e6e6e6')
+
+
+# Row positions ordering values ascending, stable, with nulls last, and the
+# number of nulls. Categorical columns are ranked through their categories
+# rather than sorting the values themselves.
+def sort_order(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        rank = np.empty(len(categories) + 1, dtype=np.int64)
+        rank[categories.argsort()] = np.arange(len(categories))
+        rank[-1] = len(categories)  # code -1 (null) sorts last
+        order = np.argsort(rank[values.array.codes], kind='stable')
+    else:
+        keys = pd.Series(values.to_numpy(), copy=False)
+        order = keys.sort_values(kind='stable', na_position='last').index.to_numpy()
+    return order, int(values.isna().sum())
+
+
+# order for a descending sort: the non-null part reversed, nulls still last
+def descending(order, nulls):
+    valid = len(order) - nulls
+    return np.concatenate((order[:valid][::-1], order[valid:]))
+
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+# Alternating row backgrounds for one page, built as a single array
+def alternate_row_styles(page):
+    even = (np.arange(len(page)) % 2 == 0)[:, None]
+    styles = np.where(even, ROW_STYLES[0], ROW_STYLES[1])
+    return pd.DataFrame(np.broadcast_to(styles, page.shape), index=page.index, columns=page.columns)
+
+
+def style_page(page):
+    return page.style.apply(alternate_row_styles, axis=None)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from claims.chartdata import FIGURE_POINT_BUDGET
+
+# Reduction modes for the Claims Over Time line
+AUTO = 'Auto (day/week/month)'
+LTTB = 'Shape-preserving (LTTB)'
+DAILY = 'Daily (no reduction)'
+MODES = [AUTO, LTTB, DAILY]
+
+# Default point budget for the LTTB mode
+DEFAULT_MAX_POINTS = 500
+
+# Longest spans, in days, still shown at daily and weekly resolution
+DAILY_SPAN_DAYS = 180
+WEEKLY_SPAN_DAYS = 3 * 365
+
+
+# Bucket size for a date span: daily for short ranges, then weekly, then monthly
+def choose_frequency(start, end):
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    if span <= DAILY_SPAN_DAYS:
+        return 'D', 'daily'
+    if span <= WEEKLY_SPAN_DAYS:
+        return 'W-MON', 'weekly'
+    return 'MS', 'monthly'
+
+
+# Sum counts per period of freq, labelled by the period start
+def resample_counts(counts, date_col, value_col, freq):
+    series = counts.set_index(date_col)[value_col]
+    if freq.startswith('W'):
+        resampled = series.resample(freq, label='left', closed='left').sum()
+    else:
+        resampled = series.resample(freq).sum()
+    return resampled.reset_index()
+
+
+# Largest-Triangle-Three-Buckets: positions of max_points samples that keep
+# the visual shape of (x, y). The first and last points are always kept.
+def lttb_indices(x, y, max_points):
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) as the third vertex
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+# Reduce a per-day count series to a size that does not grow with the date
+# span. Returns the reduced frame and a label describing its resolution.
+# Daily series longer than the figure point budget are sampled down to it.
+def reduce_time_series(counts, date_col, value_col, mode=AUTO, max_points=DEFAULT_MAX_POINTS):
+    if mode == DAILY and len(counts) > FIGURE_POINT_BUDGET:
+        mode, max_points = LTTB, FIGURE_POINT_BUDGET
+    if counts.empty or mode == DAILY:
+        return counts, 'daily'
+    if mode == LTTB:
+        max_points = min(max_points, FIGURE_POINT_BUDGET)
+        if len(counts) <= max_points:
+            return counts, 'daily'
+        x = counts[date_col].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        keep = lttb_indices(x, counts[value_col].to_numpy(), max_points)
+        return counts.iloc[keep].reset_index(drop=True), f'{max_points} point sample'
+    freq, label = choose_frequency(counts[date_col].min(), counts[date_col].max())
+    if freq == 'D':
+        return counts, label
+    return resample_counts(counts, date_col, value_col, freq), label
@@ -0,0 +1,113 @@
+import os
+
+import streamlit as st
+
+from claims.data import CLAIMS_CSV, cache_stats
+from claims.export import EXPORT_FORMATS
+from claims.figures import figure_cache_stats
+from claims.metrics import metrics_cache_stats
+from claims.refresh import current_source, refresh_stats
+from claims.sources import SourceError
+from claims.table import PAGE_SIZES, page_count, style_page
+
+# Streamlit pieces shared by the two dashboards
+
+
+# Location of the claims data: Claims.csv unless CLAIMS_SOURCE names another
+# CSV or a database URL such as sqlite:///claims.db
+def source_location():
+    return os.environ.get('CLAIMS_SOURCE', CLAIMS_CSV)
+
+
+# Function to fetch data from the claims table
+def fetch_claims_data():
+    # The source is loaded into memory once per process and reloaded in the
+    # background when it changes; each rerun uses the version current when
+    # it starts
+    try:
+        return current_source(source_location())
+    except SourceError as e:
+        # Stop with the reason rather than rendering an empty dashboard
+        print(f"Error fetching data: {e}")
+        st.error(str(e))
+        st.stop()
+
+
+# Multiselect for a column with too many values to list: only the values
+# matching the search box (most frequent first) are sent to the browser,
+# along with those already selected
+def searchable_multiselect(container, summary, label):
+    key = f"search_{summary.name}"
+    query = container.text_input(f"Search {summary.name}", key=f"{key}_query",
+                                 placeholder=f"{summary.distinct:,} values")
+    selected = st.session_state.get(key, [])
+    options = list(dict.fromkeys(selected + summary.search(query)))
+    return container.multiselect(label, options=options, key=key)
+
+
+# Sections below are fragments: their own widgets rerun only the section,
+# with the source and filters of the last full run as inputs. Changing a
+# filter reruns the whole page.
+
+# Filtered claims one server-side page at a time, sortable by any column;
+# paging and sorting rerun only this section. styled formats the page with
+# claims.table.style_page.
+@st.fragment
+def claims_table_section(source, filters, styled=False):
+    sort_col, order_col, size_col = st.columns(3)
+    sort_by = sort_col.selectbox("Sort by", options=[None] + source.columns, format_func=lambda c: c or "(file order)")
+    ascending = order_col.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+    page_size = size_col.selectbox("Rows per page", options=PAGE_SIZES)
+
+    # Back to the first page when the filters change
+    if st.session_state.get('table_filters') != filters.key():
+        st.session_state['table_filters'] = filters.key()
+        st.session_state['table_page'] = 1
+    page = st.session_state.get('table_page', 1)
+    rows, total = source.page(filters, page - 1, page_size, sort_by, ascending)
+    pages = page_count(total, page_size)
+    if page > pages:
+        page = st.session_state['table_page'] = pages
+        rows, total = source.page(filters, page - 1, page_size, sort_by, ascending)
+
+    st.dataframe(style_page(rows) if styled else rows, hide_index=True)
+    page_col, info_col = st.columns([1, 3])
+    page_col.number_input("Page", min_value=1, max_value=pages, step=1, key='table_page')
+    first = (page - 1) * page_size
+    if total:
+        info_col.caption(f"Rows {first + 1:,}–{first + len(rows):,} of {total:,} (page {page:,} of {pages:,})")
+    else:
+        info_col.caption("No claims match the filters")
+
+
+# Download of the filtered data; the file is generated in chunks only when
+# the button is clicked
+@st.fragment
+def export_section(source, filters):
+    export_format = st.selectbox("Download format", options=list(EXPORT_FORMATS))
+    file_name, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        f"Download as {export_format}", source.export_callable(filters, export_format), file_name, mime
+    )
+
+
+# Sidebar panel with the stage timings of a finished rerun and the state of
+# the dataset, metrics and figure caches and of background refresh; shown
+# only while profiling
+def performance_panel(profile):
+    if not profile.enabled:
+        return
+    with st.sidebar.expander("Performance", expanded=True):
+        st.dataframe(profile.summary(), hide_index=True)
+        dataset_stats = cache_stats()
+        st.caption(f"Dataset cache: {dataset_stats['hits']} hits, {dataset_stats['misses']} loads, "
+                   f"{dataset_stats['evictions']} evicted, {dataset_stats['size']} of {dataset_stats['maxsize']} kept")
+        metrics_stats = metrics_cache_stats()
+        st.caption(f"Metrics cache: {metrics_stats['hit_rate']:.0%} hits, {metrics_stats['size']} entries")
+        figure_stats = figure_cache_stats()
+        st.caption(f"Figure cache: {figure_stats['hit_rate']:.0%} hits, {figure_stats['size']} figures, "
+                   f"{figure_stats['nbytes'] / 2**20:.1f} MB")
+        refresh = refresh_stats(source_location())
+        if refresh is not None:
+            st.caption(f"Data version {refresh['version']}: {refresh['refreshes']} background refreshes, "
+                       f"{refresh['failures']} failed")
@@ -4,40 +4,54 @@
 # In[ ]:
 
 
-import pandas as pd
 import streamlit as st
 import plotly.express as px
 from datetime import datetime
 
-# Function to fetch data from the claims table
-def fetch_claims_data():
-    try:
-        # Load data from CSV for now
-        df = pd.read_csv('Claims.csv')
-        
-        # Ensure date columns are in the correct format
-        date_columns = [
-            'claim_received_date', 'claim_loss_date', 'claim_finalised_date',
-            'original_verified_date_of_loss_time', 'last_verified_date_of_loss_time',
-            'catastrophe_valid_from_date_time', 'catastrophe_valid_to_date_time', 'update_date'
-        ]
-        for col in date_columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce').dt.date
-        
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        df = pd.DataFrame()  # Return empty DataFrame on failure
-    return df
+from claims.chartdata import render_mode
+from claims.charts import city_bar, owner_bar
+from claims.figures import cached_figure
+from claims.filters import FilterState
+from claims.metrics import FINANCIAL_COLUMNS
+from claims.profiling import rerun_profile
+from claims.timeseries import DEFAULT_MAX_POINTS, MODES, reduce_time_series
+from claims.ui import (
+    claims_table_section, export_section, fetch_claims_data, performance_panel, searchable_multiselect,
+)
+
+# Sections below are fragments: their own widgets rerun only the section,
+# with the source and filters of the last full run as inputs. Changing a
+# filter reruns the whole page.
+
+# Claims Over Time chart with its resolution and point budget options
+@st.fragment
+def claims_over_time_section(source, filters):
+    time_mode = st.selectbox("Resolution", options=MODES)
+    max_points = st.number_input("Point budget (LTTB)", min_value=10, max_value=5000, value=DEFAULT_MAX_POINTS, step=50)
+    def build_time_chart(source, filters, time_mode, max_points):
+        claims_over_time, resolution = reduce_time_series(
+            source.count_by_day(filters), 'claim_received_date', 'claim_count',
+            mode=time_mode, max_points=max_points
+        )
+        return px.line(claims_over_time, x='claim_received_date', y='claim_count', title=f"Claims Over Time ({resolution})",
+                       render_mode=render_mode(len(claims_over_time)))
+    st.plotly_chart(cached_figure(source, 'graph.time', filters, build_time_chart, (time_mode, max_points)))
 
 # Streamlit app for the report with independent filters and charts
 def main():
     st.title("Claims Report Dashboard")
 
+    # Stage timings, on with CLAIMS_PROFILE or ?profile=1 in the URL
+    profile = rerun_profile('graph', st.query_params.get('profile'))
+
     # Fetch data from the database
-    data = fetch_claims_data()
+    profile.stage('load')
+    source = fetch_claims_data()
 
-    if not data.empty:
-        filtered_data = data.copy()  # Start with a copy for independent filtering
+    if not source.empty:
+        # Filters are collected first and resolved by the source in one pass
+        profile.stage('filters')
+        filters = FilterState()
 
         # Text-based filters for each relevant column
         text_columns = [
@@ -45,10 +59,17 @@ def main():
             'fault_rating', 'fault_categorisation'
         ]
         for col in text_columns:
-            unique_values = data[col].dropna().unique()
+            # Columns with very many values are searched rather than listed;
+            # nothing selected means no filter
+            if source.catalog[col].searchable:
+                selected_values = searchable_multiselect(st, source.catalog[col], f"Filter by {col}")
+                if selected_values:
+                    filters.text[col] = selected_values
+                continue
+            unique_values = source.options(col)
             selected_values = st.multiselect(f"Filter by {col}", options=unique_values, default=unique_values)
             if selected_values:
-                filtered_data = filtered_data[filtered_data[col].isin(selected_values)]
+                filters.text[col] = selected_values
 
         # Independent Date range filters
         date_columns = [
@@ -57,66 +78,68 @@ def main():
             'catastrophe_valid_from_date_time', 'catastrophe_valid_to_date_time'
         ]
         for col in date_columns:
-            min_date, max_date = data[col].min(), data[col].max()
-            if pd.notnull(min_date) and pd.notnull(max_date):
-                date_range = st.date_input(f"{col} Range", value=(min_date, max_date))
-                if date_range:
-                    filtered_data = filtered_data[filtered_data[col].between(date_range[0], date_range[1])]
-
-        # Independent Numeric filters
-#         numeric_columns = [
-#             'claim_number', 'policy_number', 'total_open_recovery_reserve', 
-#             'total_open_remaining_reserve', 'total_open_future_payment', 
-#             'total_recovery', 'total_net_incurred', 'total_paid'
-#         ]
-#         for col in numeric_columns:
-#             min_val, max_val = data[col].min(), data[col].max()
-#             if pd.notnull(min_val) and pd.notnull(max_val):
-#                 value_range = st.slider(f"Filter by {col} range", min_val, max_val, (min_val, max_val))
-#                 if value_range:
-#                     filtered_data = filtered_data[(filtered_data[col] >= value_range[0]) & (filtered_data[col] <= value_range[1])]
+            bounds = source.date_bounds(col)
+            if bounds is not None:
+                date_range = st.date_input(f"{col} Range", value=bounds)
+                if len(date_range) == 2:
+                    filters.dates[col] = (date_range[0], date_range[1])
+
+        # Independent Numeric filters, seeded from the catalog's min/max. A
+        # range is only filtered on once narrowed, and resolves to rows by
+        # binary search over the column's sort order (claims.index)
+        for col in FINANCIAL_COLUMNS:
+            value_range = source.catalog[col].range if col in source.catalog else None
+            if value_range is not None and value_range[0] < value_range[1]:
+                min_val, max_val = float(value_range[0]), float(value_range[1])
+                selected_range = st.slider(f"Filter by {col} range", min_val, max_val, (min_val, max_val))
+                if selected_range != (min_val, max_val):
+                    filters.numbers[col] = selected_range
 
         # Display filtered statistics
+        profile.stage('statistics')
         st.subheader("Filtered Claims Statistics")
-        st.write("Total Claims:", filtered_data["claim_number"].nunique())
+        st.write("Total Claims:", source.count_claims(filters))
 
-        # Display interactive bar chart for claims by status
+        # Display interactive bar chart for claims by status. Figures are
+        # cached per dataset version, filters and chart options
+        # (claims.figures), so a repeated state reuses the built chart
+        profile.stage('chart.status')
         st.subheader("Claims by Status")
-        status_counts = filtered_data['claim_status'].value_counts().reset_index()
-        status_counts.columns = ['claim_status', 'count']
-        fig_status = px.bar(status_counts, x='claim_status', y='count', title="Claims by Status", color='claim_status')
-        st.plotly_chart(fig_status)
+        def build_status_chart(source, filters):
+            status_counts = source.count_by(filters, 'claim_status')
+            return px.bar(status_counts, x='claim_status', y='count', title="Claims by Status", color='claim_status')
+        st.plotly_chart(cached_figure(source, 'graph.status', filters, build_status_chart))
 
         # Display line chart for claims over time (number of claims per day)
+        profile.stage('chart.time')
         st.subheader("Claims Over Time")
-        claims_over_time = filtered_data.groupby('claim_received_date').size().reset_index(name='claim_count')
-        fig_time = px.line(claims_over_time, x='claim_received_date', y='claim_count', title="Claims Over Time")
-        st.plotly_chart(fig_time)
+        claims_over_time_section(source, filters)
 
         # Display bar chart for claims by city (loss location)
+        profile.stage('chart.city')
         st.subheader("Claims by Loss Location (City)")
-        city_counts = filtered_data['loss_location_city'].value_counts().reset_index()
-        city_counts.columns = ['loss_location_city', 'count']
-        fig_city = px.bar(city_counts, x='loss_location_city', y='count', title="Claims by Loss Location (City)", color='loss_location_city')
-        st.plotly_chart(fig_city)
+        st.plotly_chart(cached_figure(source, 'graph.city', filters, city_bar))
 
         # Display bar chart for claims by claim owner
+        profile.stage('chart.owner')
         st.subheader("Claims by Claim Owner")
-        owner_counts = filtered_data.groupby(['claim_owner_first_name', 'claim_owner_last_name']).size().reset_index(name='claim_count')
-        fig_owner = px.bar(owner_counts, x='claim_owner_first_name', y='claim_count', title="Claims by Claim Owner", color='claim_owner_first_name')
-        st.plotly_chart(fig_owner)
+        st.plotly_chart(cached_figure(source, 'graph.owner', filters, owner_bar))
 
         # Display filtered claims data and download option
+        profile.stage('table')
         st.subheader("Filtered Claims Data")
-        st.dataframe(filtered_data)
+        claims_table_section(source, filters)
 
         # Option to download the filtered data
-        csv = filtered_data.to_csv(index=False)
-        st.download_button("Download as CSV", csv, "filtered_claims.csv", "text/csv")
+        profile.stage('export')
+        export_section(source, filters)
         
     else:
         st.warning("No data available.")
 
+    profile.finish()
+    performance_panel(profile)
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.synthetic import generate_claims_csv
+from claims.data import load_dataset
+from claims.partitions import split_by_month
+from claims.sql import import_csv
+
+
+# A small synthetic extract shared by the whole run
+@pytest.fixture(scope='session')
+def claims_csv(tmp_path_factory):
+    return generate_claims_csv(str(tmp_path_factory.mktemp('claims') / 'Claims.csv'), 5_000, seed=7)
+
+
+@pytest.fixture(scope='session')
+def dataset(claims_csv):
+    return load_dataset(claims_csv)
+
+
+# The same extract imported into SQLite
+@pytest.fixture(scope='session')
+def sqlite_url(claims_csv, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('sql') / 'claims.db'}"
+    import_csv(claims_csv, url)
+    return url
+
+
+# The same extract split into monthly partition files
+@pytest.fixture(scope='session')
+def partitions_dir(claims_csv, tmp_path_factory):
+    out_dir = tmp_path_factory.mktemp('parts')
+    split_by_month(claims_csv, str(out_dir))
+    return str(out_dir)
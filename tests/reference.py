@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from claims.filters import normalize_claim_number
+
+# Plain pandas versions of the filters and aggregates, the reference the
+# indexed and pre-aggregated paths are checked against
+
+
+def filter_rows(frame, state):
+    mask = pd.Series(True, index=frame.index)
+    if state.has_claim_filter:
+        claims = frame['claim_number'].map(normalize_claim_number)
+        matches = claims.isin([normalize_claim_number(n) for n in state.claim_numbers])
+        for prefix in state.claim_prefixes:
+            matches |= claims.str.startswith(normalize_claim_number(prefix))
+        numbers = pd.to_numeric(claims, errors='coerce')
+        for lo, hi in state.claim_ranges:
+            matches |= numbers.between(lo, hi)
+        mask &= matches
+    for col, selected in state.text.items():
+        mask &= frame[col].isin(selected)
+    for col, (start, end) in state.dates.items():
+        mask &= frame[col].between(pd.Timestamp(start), pd.Timestamp(end))
+    for col, (lo, hi) in state.numbers.items():
+        mask &= frame[col].between(lo, hi)
+    return frame[mask.to_numpy()]
+
+
+# {value: claims} of a counts frame, so ties may come in any order
+def as_counts(counts):
+    return dict(zip(counts.iloc[:, 0].astype(str), counts.iloc[:, -1].astype(np.int64)))
+
+
+def value_counts(rows, col):
+    return {str(value): int(n) for value, n in rows[col].value_counts().items() if n}
+
+
+def daily_counts(rows, col='claim_received_date'):
+    return {str(day.date()): int(n) for day, n in rows[col].dropna().value_counts().items()}
+
+
+def monthly_counts(rows, col, time_column='claim_received_date'):
+    rows = rows.dropna(subset=[time_column, col])
+    months = rows[time_column].dt.strftime('%Y-%m')
+    return {(month, str(value)): int(n)
+            for (month, value), n in rows.groupby([months, rows[col].astype(str)]).size().items()}
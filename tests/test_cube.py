@@ -0,0 +1,138 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from claims.cube import ClaimsCube, CubeBuilder
+from claims.data import DATE_FILTER_COLUMNS, TEXT_FILTER_COLUMNS
+from claims.filters import FilterState
+from tests.reference import as_counts, daily_counts, filter_rows, monthly_counts, value_counts
+
+
+def _states(frame):
+    status = [frame['claim_status'].cat.categories[0]]
+    return {
+        'none': FilterState(),
+        'own_column': FilterState(text={'claim_status': status}),
+        'whole_months': FilterState(dates={'claim_received_date': (datetime.date(2019, 3, 1),
+                                                                   datetime.date(2021, 8, 31))}),
+        'select_all': FilterState(text={col: list(frame[col].cat.categories) for col in TEXT_FILTER_COLUMNS}),
+        'full_loss_range': FilterState(dates={'claim_loss_date': (frame['claim_loss_date'].min().date(),
+                                                                  frame['claim_loss_date'].max().date())}),
+        'partial_month': FilterState(dates={'claim_received_date': (datetime.date(2019, 3, 10),
+                                                                    datetime.date(2021, 8, 31))}),
+        'other_column': FilterState(text={'line_of_business': [frame['line_of_business'].cat.categories[0]]}),
+        'other_date_range': FilterState(dates={'claim_loss_date': (datetime.date(2019, 1, 1),
+                                                                   datetime.date(2020, 1, 1))}),
+        'number_range': FilterState(numbers={'total_paid': (100.0, 1000.0)}),
+        'claim_number': FilterState(claim_numbers=[str(frame['claim_number'].iloc[0])]),
+    }
+
+
+STATES = ['none', 'own_column', 'whole_months', 'select_all', 'full_loss_range', 'partial_month',
+          'other_column', 'other_date_range', 'number_range', 'claim_number']
+# The rollups answering each state; the others fall back to the rows
+ANSWERED = {
+    'none': {'counts', 'monthly', 'daily'},
+    'own_column': {'counts', 'monthly'},
+    'whole_months': {'counts', 'monthly', 'daily'},
+    'select_all': {'counts', 'monthly', 'daily'},
+    'full_loss_range': {'counts', 'monthly', 'daily'},
+    'partial_month': {'daily'},
+}
+
+
+@pytest.mark.parametrize('name', STATES)
+def test_rollups_match_rows(dataset, name):
+    frame = dataset.frame
+    state = _states(frame)[name]
+    rows = filter_rows(frame, state)
+    cube = dataset.cube
+
+    counts = cube.counts(state, 'claim_status')
+    monthly = cube.monthly(state, 'claim_status')
+    daily = cube.daily(state)
+    answered = {label for label, result in (('counts', counts), ('monthly', monthly), ('daily', daily))
+                if result is not None}
+    assert answered == ANSWERED.get(name, set())
+
+    if counts is not None:
+        assert as_counts(counts) == value_counts(rows, 'claim_status')
+    if monthly is not None:
+        assert {(m, str(v)): n for m, v, n in monthly.itertuples(index=False)} == monthly_counts(rows, 'claim_status')
+    if daily is not None:
+        assert {str(day.date()): n for day, n in daily.itertuples(index=False)} == daily_counts(rows)
+
+    # The dataset answers every state, from the cube or from the rows
+    assert as_counts(dataset.count_by(state, 'claim_status')) == value_counts(rows, 'claim_status')
+    assert daily_counts(rows) == {str(day.date()): n for day, n in dataset.count_by_day(state).itertuples(index=False)}
+
+
+# Cells are bounded by the charts they answer, times the combinations of
+# missing filter columns that occur
+def test_rollups_stay_small(dataset):
+    frame = dataset.frame
+    months = frame['claim_received_date'].dt.to_period('M').nunique()
+    patterns = len(frame[TEXT_FILTER_COLUMNS + DATE_FILTER_COLUMNS[1:]].isna().drop_duplicates())
+    bound = sum(months * len(frame[col].cat.categories) for col in TEXT_FILTER_COLUMNS)
+    assert len(dataset.cube) <= (bound + frame['claim_received_date'].nunique()) * patterns
+
+
+# The state both dashboards start from: every date slider at its full
+# range, and in the graph dashboard every text value selected
+def dashboard_defaults(source):
+    dates = {col: source.date_bounds(col) for col in DATE_FILTER_COLUMNS if source.date_bounds(col) is not None}
+    text = {col: source.options(col) for col in TEXT_FILTER_COLUMNS if not source.catalog[col].searchable}
+    return [FilterState(dates=dates), FilterState(text=text, dates=dates)]
+
+
+def test_dashboard_defaults_are_answered_by_cube(dataset):
+    frame = dataset.frame
+    assert frame['claim_finalised_date'].isna().any()
+    for state in dashboard_defaults(dataset):
+        rows = filter_rows(frame, state)
+        assert len(rows) and len(rows) < len(frame)
+        for col in ('claim_status', 'line_of_business'):
+            counts = dataset.cube.counts(state, col)
+            assert counts is not None
+            assert as_counts(counts) == as_counts(dataset.count_by(state, col)) == value_counts(rows, col)
+        monthly = dataset.cube.monthly(state, 'claim_status')
+        assert monthly is not None
+        assert {(m, str(v)): n for m, v, n in monthly.itertuples(index=False)} == monthly_counts(rows, 'claim_status')
+        daily = dataset.cube.daily(state)
+        assert daily is not None
+        assert {str(day.date()): n for day, n in daily.itertuples(index=False)} == daily_counts(rows)
+
+
+def test_streamed_cube_matches_built(dataset):
+    frame = dataset.frame
+    builder = CubeBuilder(TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+    for start in range(0, len(frame), 700):
+        builder.add(frame.iloc[start:start + 700])
+    streamed, built = builder.build(frame), ClaimsCube(frame, TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+    for state in _states(frame).values():
+        for col in ('claim_status', 'line_of_business'):
+            a, b = streamed.counts(state, col), built.counts(state, col)
+            assert (a is None) == (b is None)
+            if a is not None:
+                assert as_counts(a) == as_counts(b)
+
+
+def test_upserted_cube_matches_rebuilt(dataset):
+    frame = dataset.frame
+    changes = frame.iloc[:50].copy()
+    changes['claim_status'] = changes['claim_status'].cat.categories[-1]
+    changes['claim_received_date'] = pd.Timestamp('2022-06-15')
+    appended = frame.iloc[50:60].copy()
+    appended['claim_number'] = appended['claim_number'] + 10**9
+    updated = dataset.upsert(pd.concat([changes, appended]))
+    rebuilt = ClaimsCube(updated.frame, TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+    for state in _states(updated.frame).values():
+        a, b = updated.cube.monthly(state, 'claim_status'), rebuilt.monthly(state, 'claim_status')
+        assert (a is None) == (b is None)
+        if a is not None:
+            assert a.astype(str).equals(b.astype(str))
+        a, b = updated.cube.daily(state), rebuilt.daily(state)
+        assert (a is None) == (b is None)
+        if a is not None:
+            assert a.equals(b)
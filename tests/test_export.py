@@ -0,0 +1,42 @@
+import io
+
+import pandas as pd
+import pytest
+
+from claims import sql
+from claims.filters import FilterState
+from claims.sql import import_csv, sql_source
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+# The extract with every claim lacking a claim_finalised_date first, so the
+# first export chunk holds no finalised dates at all
+@pytest.fixture(scope='module')
+def nulls_first_csv(claims_csv, tmp_path_factory):
+    rows = pd.read_csv(claims_csv, dtype=str, keep_default_na=False)
+    rows = rows.sort_values('claim_finalised_date', key=lambda dates: dates != '', kind='stable')
+    path = tmp_path_factory.mktemp('nulls') / 'Claims.csv'
+    rows.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('scheme', ['sqlite', 'duckdb'])
+def test_sql_parquet_export_with_missing_first_chunk(nulls_first_csv, tmp_path, monkeypatch, scheme):
+    if scheme == 'duckdb':
+        pytest.importorskip('duckdb')
+    url = f"{scheme}:///{tmp_path / 'claims.db'}"
+    import_csv(nulls_first_csv, url)
+    monkeypatch.setattr(sql, 'EXPORT_CHUNK_ROWS', 500)
+    source = sql_source(url)
+
+    table = pq.read_table(io.BytesIO(source.export_callable(FilterState(), 'Parquet')()))
+    expected = pd.read_csv(nulls_first_csv, dtype=str, keep_default_na=False)
+    assert table.num_rows == len(expected)
+    assert str(table.schema.field('claim_finalised_date').type) == 'timestamp[us]'
+    assert str(table.schema.field('claim_received_date').type) == 'timestamp[us]'
+
+    exported = table.to_pandas()
+    assert (exported['claim_finalised_date'].isna() == (expected['claim_finalised_date'] == '')).all()
+    assert exported['claim_finalised_date'].iloc[:500].isna().all()
+    assert exported['claim_received_date'].notna().sum() == (expected['claim_received_date'] != '').sum()
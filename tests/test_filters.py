@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from claims.data import load_dataset
+from claims.filters import FilterState
+from claims.index import ClaimNumberIndex
+from claims.partitions import load_partitioned, split_by_month
+from claims.sql import import_csv, sql_source
+from tests.reference import filter_rows
+
+# Claim numbers that read like ranges or overlap as numbers and prefixes
+CLAIM_NUMBERS = ['2023-0001', '2023-0002', '2023', '1', 'abc 123', 'ABC-9', '20230001']
+
+
+@pytest.mark.parametrize('query, numbers, prefixes, ranges', [
+    ('2023-0001', ['2023-0001'], [], []),
+    (' a1,b2 , c3* ', ['A1', 'B2'], ['C3'], []),
+    ('ABC 123', ['ABC 123'], [], []),
+    ('1000..2000, 30 .. 20', [], [], [(1000, 2000), (20, 30)]),
+    ('1000-2000', ['1000-2000'], [], []),
+    (', *,', [], [], []),
+])
+def test_parse_claim_query(query, numbers, prefixes, ranges):
+    state = FilterState().parse_claim_query(query)
+    assert (state.claim_numbers, state.claim_prefixes, state.claim_ranges) == (numbers, prefixes, ranges)
+
+
+# The extract with its first claim numbers replaced by CLAIM_NUMBERS
+@pytest.fixture(scope='module')
+def claims_with_numbers(claims_csv, tmp_path_factory):
+    rows = pd.read_csv(claims_csv, dtype=str, keep_default_na=False)
+    rows.loc[:len(CLAIM_NUMBERS) - 1, 'claim_number'] = CLAIM_NUMBERS
+    path = tmp_path_factory.mktemp('numbers') / 'Claims.csv'
+    rows.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def sources(claims_with_numbers, tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('numbers_sql') / 'claims.db'}"
+    import_csv(claims_with_numbers, url)
+    parts = tmp_path_factory.mktemp('numbers_parts')
+    split_by_month(claims_with_numbers, str(parts))
+    dataset = load_dataset(claims_with_numbers)
+    return dataset, {'dataset': dataset, 'sql': sql_source(url), 'partitions': load_partitioned(str(parts))}
+
+
+QUERIES = ['2023-0001', '2023', '2023-0001, 1', 'abc 123', 'ABC*', '2023*', '1..2023', '1..2023, ABC*']
+
+
+@pytest.mark.parametrize('name', ['dataset', 'sql', 'partitions'])
+@pytest.mark.parametrize('query', QUERIES)
+def test_claim_filter_matches_reference(sources, name, query):
+    dataset, by_name = sources
+    state = FilterState().parse_claim_query(query)
+    assert by_name[name].count_claims(state) == len(filter_rows(dataset.frame, state))
+
+
+def test_hyphenated_claim_number_is_found(sources):
+    dataset, by_name = sources
+    state = FilterState().parse_claim_query('2023-0001')
+    for source in by_name.values():
+        assert source.count_claims(state) == 1
+
+
+# Patching the claim-number index for rewritten and appended rows gives the
+# same lookups as building it again, for numeric and text claim numbers
+@pytest.mark.parametrize('text', [False, True])
+def test_claim_index_updated_matches_rebuilt(text):
+    rng = np.random.default_rng(5)
+    values = pd.Series(rng.integers(1, 3000, 2000))
+    if text:
+        values = values.astype(str).where(values % 5 != 0, 'C-' + values.astype(str))
+    values[rng.choice(2000, 50, replace=False)] = None
+    index = ClaimNumberIndex(values)
+
+    changed = np.concatenate((rng.choice(2000, 300, replace=False), np.arange(2000, 2100)))
+    updated_values = pd.concat([values, values.iloc[:100]], ignore_index=True)
+    replacements = pd.Series(rng.integers(1, 3500, len(changed)))
+    updated_values[changed] = replacements.astype(str).to_numpy() if text else replacements.to_numpy()
+    updated_values[changed[::9]] = None
+
+    updated, rebuilt = index.updated(updated_values, changed), ClaimNumberIndex(updated_values)
+    probes = [str(v) for v in rng.integers(1, 3500, 200)] + ['C-10', 'C-15', 'nope']
+    for lookup in (lambda i: i.lookup(probes), lambda i: i.prefix('12'), lambda i: i.prefix('C-1'),
+                   lambda i: i.range(100, 2500)):
+        assert np.array_equal(np.sort(lookup(updated)), np.sort(lookup(rebuilt)))
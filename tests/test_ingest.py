@@ -0,0 +1,29 @@
+import pandas as pd
+
+from claims.categories import CATEGORY_COLUMNS
+from claims.cube import CubeBuilder
+from claims.data import DASHBOARD_COLUMNS, DATE_COLUMNS, DATE_FILTER_COLUMNS, TEXT_FILTER_COLUMNS, read_claims_csv
+from claims.filters import FilterState
+from claims.ingest import stream_csv
+from tests.reference import as_counts, value_counts
+
+
+# A text column blank throughout the first chunks streams in, both into the
+# kept frame and into the rollups fed from each chunk
+def test_stream_chunk_with_blank_text_column(claims_csv, tmp_path):
+    rows = pd.read_csv(claims_csv, dtype=str, keep_default_na=False)
+    rows.loc[:1499, 'fault_categorisation'] = ''
+    rows.loc[:1499, 'claim_status'] = ''
+    path = tmp_path / 'Claims.csv'
+    rows.to_csv(path, index=False)
+
+    builder = CubeBuilder(TEXT_FILTER_COLUMNS, DATE_FILTER_COLUMNS)
+    frame, progress = stream_csv(str(path), DASHBOARD_COLUMNS, DATE_COLUMNS, CATEGORY_COLUMNS, [builder],
+                                 chunk_rows=1000, on_progress=None)
+    expected = read_claims_csv(str(path), DASHBOARD_COLUMNS)
+    assert progress.chunks == 5
+    for col in ('fault_categorisation', 'claim_status'):
+        assert frame[col].isna().sum() == expected[col].isna().sum() == 1500
+        assert value_counts(frame, col) == value_counts(expected, col)
+    counts = builder.build(frame).counts(FilterState(), 'claim_status')
+    assert as_counts(counts) == value_counts(expected, 'claim_status')
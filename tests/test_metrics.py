@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from claims.filters import FilterState
+from claims.metrics import compute_metrics, format_money
+from claims.sql import sql_source
+from tests.reference import filter_rows
+
+
+# The card definitions written out directly in pandas
+def reference_metrics(rows):
+    open_recovery = rows['total_open_recovery_reserve'].fillna(0)
+    recovered = rows['total_recovery'].fillna(0)
+    net_incurred = rows['total_net_incurred'].fillna(0).sum()
+    opportunity = open_recovery > 0
+    leakage = open_recovery[opportunity].sum()
+    return {
+        'claims_monitored': rows['claim_number'].nunique(),
+        'claims': len(rows),
+        'leakage_claims': int(opportunity.sum()),
+        'not_actioned': int((opportunity & (recovered <= 0)).sum()),
+        'potential_leakage': leakage,
+        'net_incurred': net_incurred,
+        'opportunity_pct': round(100 * opportunity.sum() / len(rows), 1) if len(rows) else None,
+        'leakage_rate_pct': round(100 * leakage / net_incurred, 1) if net_incurred else None,
+    }
+
+
+def _assert_metrics(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if value is None or isinstance(value, (int, np.integer)):
+            assert actual[key] == value, key
+        else:
+            assert actual[key] == pytest.approx(value), key
+
+
+STATES = [
+    FilterState(),
+    FilterState(text={'claim_status': ['Open']}),
+    FilterState(text={'line_of_business': ['Marine', 'Travel']}, numbers={'total_paid': (500.0, 5000.0)}),
+    FilterState(text={'claim_status': ['no such status']}),
+]
+
+
+def test_metrics_match_reference(dataset):
+    for state in STATES:
+        _assert_metrics(dataset.metrics(state), reference_metrics(filter_rows(dataset.frame, state)))
+
+
+def test_sql_metrics_match_reference(dataset, sqlite_url):
+    source = sql_source(sqlite_url)
+    for state in STATES:
+        _assert_metrics(source.metrics(state), reference_metrics(filter_rows(dataset.frame, state)))
+
+
+def test_missing_values_count_as_zero():
+    rows = pd.DataFrame({
+        'claim_number': [1, 2, 2, 3],
+        'total_open_recovery_reserve': [100.0, np.nan, 50.0, 0.0],
+        'total_open_remaining_reserve': [0.0] * 4,
+        'total_open_future_payment': [0.0] * 4,
+        'total_recovery': [np.nan, 10.0, 5.0, 0.0],
+        'total_net_incurred': [1000.0, np.nan, 500.0, 0.0],
+        'total_paid': [0.0] * 4,
+    })
+    metrics = compute_metrics(rows)
+    _assert_metrics(metrics, reference_metrics(rows))
+    assert metrics['claims_monitored'] == 3
+    assert metrics['leakage_claims'] == 2
+    assert metrics['not_actioned'] == 1
+    assert metrics['leakage_rate_pct'] == 10.0
+
+
+def test_money_metrics_need_financial_columns():
+    metrics = compute_metrics(pd.DataFrame({'claim_number': [1, 2], 'total_paid': [1.0, 2.0]}))
+    assert metrics['claims_monitored'] == 2
+    assert all(metrics[key] is None for key in ('leakage_claims', 'potential_leakage', 'opportunity_pct'))
+
+
+def test_format_money():
+    assert format_money(None) == "n/a"
+    assert format_money(950) == "$950"
+    assert format_money(12_345) == "$12.3K"
+    assert format_money(-2_500_000) == "$-2.5M"
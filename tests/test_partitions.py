@@ -0,0 +1,28 @@
+import pandas as pd
+
+from claims.data import load_dataset
+from claims.dates import parse_dates
+from claims.filters import FilterState
+from claims.partitions import load_partitioned, split_by_month
+from tests.reference import value_counts
+
+BLANK_COLUMNS = ['fault_rating', 'fault_categorisation']
+
+
+# A month with no value at all in some text columns is ordinary data; its
+# partition's categories must still combine with the others'
+def test_partition_with_blank_text_columns(claims_csv, tmp_path):
+    rows = pd.read_csv(claims_csv, dtype=str, keep_default_na=False)
+    months = parse_dates(rows['claim_received_date']).dt.strftime('%Y-%m')
+    rows.loc[months == months.iloc[0], BLANK_COLUMNS] = ''
+    path = tmp_path / 'Claims.csv'
+    rows.to_csv(path, index=False)
+    split_by_month(str(path), str(tmp_path / 'parts'))
+
+    source = load_partitioned(str(tmp_path / 'parts')).warm()
+    expected = load_dataset(str(path)).frame
+    frame = source.dataset(FilterState()).frame
+    assert len(frame) == len(expected)
+    for col in BLANK_COLUMNS:
+        assert value_counts(frame, col) == value_counts(expected, col)
+        assert frame[col].isna().sum() == expected[col].isna().sum()
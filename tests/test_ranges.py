@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from claims.filters import FilterState
+from claims.index import SortedNumbers
+from claims.partitions import load_partitioned
+from claims.sql import sql_source
+from tests.reference import as_counts, filter_rows, value_counts
+
+STATES = [
+    FilterState(numbers={'total_paid': (1000.0, 2500.0)}),
+    FilterState(numbers={'total_recovery': (0.0, 0.0)}),
+    FilterState(numbers={'total_net_incurred': (2000.0, 1e12), 'total_paid': (-1e12, 3000.0)}),
+    FilterState(numbers={'total_open_recovery_reserve': (1.0, 1e12)}, text={'claim_status': ['Open']},
+                dates={'claim_received_date': ('2021-01-01', '2021-12-31')}),
+    FilterState(numbers={'total_paid': (1e12, 2e12)}),
+]
+
+
+@pytest.fixture(scope='module')
+def sources(dataset, sqlite_url, partitions_dir):
+    return {'dataset': dataset, 'sql': sql_source(sqlite_url), 'partitions': load_partitioned(partitions_dir)}
+
+
+@pytest.mark.parametrize('name', ['dataset', 'sql', 'partitions'])
+@pytest.mark.parametrize('state', STATES, ids=range(len(STATES)))
+def test_number_ranges_match_reference(dataset, sources, name, state):
+    source = sources[name]
+    rows = filter_rows(dataset.frame, state)
+    assert source.count_claims(state) == rows['claim_number'].nunique()
+    assert as_counts(source.count_by(state, 'line_of_business')) == value_counts(rows, 'line_of_business')
+
+
+# Updating the sorted index for rewritten and appended rows gives the same
+# lookups as building it again
+def test_sorted_numbers_updated_matches_rebuilt():
+    rng = np.random.default_rng(3)
+    values = pd.Series(rng.integers(0, 50, 1000).astype(np.float64))
+    values[rng.choice(1000, 100, replace=False)] = np.nan
+    index = SortedNumbers(values)
+
+    changed = np.concatenate((rng.choice(1000, 150, replace=False), np.arange(1000, 1100)))
+    updated_values = pd.concat([values, pd.Series(np.zeros(100))], ignore_index=True)
+    updated_values[changed] = rng.integers(0, 50, len(changed)).astype(np.float64)
+    updated_values[changed[::7]] = np.nan
+
+    updated, rebuilt = index.updated(updated_values, changed), SortedNumbers(updated_values)
+    assert (np.diff(updated.numbers) >= 0).all()
+    for lo, hi in [(0, 49), (10, 10), (5.5, 20), (-1, 3), (60, 70)]:
+        assert np.array_equal(np.sort(updated.lookup(lo, hi)), np.sort(rebuilt.lookup(lo, hi)))